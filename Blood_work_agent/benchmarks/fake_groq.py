@@ -0,0 +1,150 @@
+"""A local stand-in for the Groq chat completions API, for offline load tests.
+
+Answers POST /openai/v1/chat/completions with canned Bloodwork steps after a
+configurable delay: a {"steps": [...]} object for single-pass requests, one
+step object per call otherwise, and an SSE token stream when stream=true.
+Point the app at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+
+    python benchmarks/fake_groq.py --port 8790 --latency-ms 400
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STEPS = [
+    {"step": "plan", "content": "Identify the analytes the question is about and find them in the report."},
+    {"step": "analyze", "content": "Compare each reported value with its reference range."},
+    {"step": "retrieve", "content": "The report lists the values together with their reference ranges."},
+    {"step": "synthesize", "content": "Most values are within range; the flagged ones need a closer look."},
+    {"step": "output", "content": "Your report is mostly within normal limits. Please review the flagged values with your doctor."},
+]
+STREAM_CHUNK_CHARS = 16
+
+
+class FakeGroqStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.streamed_calls = 0
+        self.prompt_chars = 0
+
+    def record(self, messages, stream):
+        with self.lock:
+            self.calls += 1
+            self.streamed_calls += int(stream)
+            self.prompt_chars += sum(len(m.get("content") or "") for m in messages)
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "streamed_calls": self.streamed_calls,
+            "prompt_chars": self.prompt_chars,
+            # Rough, but good enough to compare runs.
+            "approx_prompt_tokens": self.prompt_chars // 4,
+        }
+
+
+def _reply_for(messages):
+    last = messages[-1].get("content") or ""
+    if '"steps"' in last:
+        return json.dumps({"steps": STEPS})
+    # Iterative mode: one step per call, in order.
+    done = sum(1 for m in messages if m.get("role") == "user" and m.get("content") == "Continue with the next step.")
+    return json.dumps(STEPS[min(done, len(STEPS) - 1)])
+
+
+def make_handler(latency_s, token_delay_s, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            messages = request.get("messages", [])
+            stream = bool(request.get("stream"))
+            stats.record(messages, stream)
+            content = _reply_for(messages)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+            model = request.get("model", "fake")
+            time.sleep(latency_s)
+
+            if not stream:
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send_event(data):
+                event = f"data: {data}\n\n".encode()
+                self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                self.wfile.flush()
+
+            for i in range(0, len(content), STREAM_CHUNK_CHARS):
+                send_event(json.dumps({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": content[i:i + STREAM_CHUNK_CHARS]}, "finish_reason": None}],
+                }))
+                time.sleep(token_delay_s)
+            send_event(json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_fake_groq(port=0, latency_ms=300, token_delay_ms=5):
+    """Starts the server in a background thread; returns (server, stats). server.server_port has the port."""
+    stats = FakeGroqStats()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency_ms / 1000, token_delay_ms / 1000, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-groq", daemon=True).start()
+    return server, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency-ms", type=int, default=300, help="delay before each reply (time to first token)")
+    parser.add_argument("--token-delay-ms", type=int, default=5, help="delay between streamed chunks")
+    args = parser.parse_args()
+    server, _ = start_fake_groq(args.port, args.latency_ms, args.token_delay_ms)
+    print(f"fake Groq listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
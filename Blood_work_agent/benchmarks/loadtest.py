@@ -0,0 +1,400 @@
+"""Offline load test for the Bloodwork API (Blood_work_agent/new.py:app).
+
+Starts the fake Groq server from fake_groq.py, runs the app under uvicorn in
+a subprocess against it (in-memory Qdrant, fake embedder unless --embedder
+minilm), and drives /upload, /chat and /chat/stream with a synthetic PDF
+corpus at a fixed concurrency. Reports p50/p95/p99 latency, throughput,
+error rate and server RSS per endpoint. With --output the results are
+written as JSON so runs can be compared.
+
+    python benchmarks/loadtest.py --uploads 40 --chats 200 --concurrency 16 --output run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_groq import start_fake_groq
+
+QUERIES = [
+    # Answered from the lab table.
+    "is my LDL high?",
+    "what is my hemoglobin level?",
+    # Go through retrieval and the model.
+    "Summarise the main concerns in this report and what I should ask my doctor.",
+    "How do my cholesterol results relate to my triglycerides and blood sugar?",
+]
+
+ANALYTES = [
+    ("Hemoglobin", "g/dL", 13.0, 17.0),
+    ("LDL Cholesterol", "mg/dL", 0, 100),
+    ("HDL Cholesterol", "mg/dL", 40, 60),
+    ("Triglycerides", "mg/dL", 0, 150),
+    ("Glucose", "mg/dL", 70, 100),
+    ("HbA1c", "%", 4.0, 5.6),
+    ("TSH", "mIU/L", 0.4, 4.0),
+    ("Creatinine", "mg/dL", 0.7, 1.3),
+    ("Vitamin B12", "pg/mL", 200, 900),
+    ("Platelet Count", "10^3/uL", 150, 450),
+]
+FILLER = "The sample was collected and analysed under standard laboratory conditions".split()
+
+
+# --- synthetic corpus ---
+
+def _pdf_bytes(pages):
+    """A minimal text-only PDF with one Helvetica line per entry in each page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    font_id = 3 + 2 * len(pages)
+    for i, lines in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R"
+            f" /Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        escaped = (line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines)
+        text = "BT /F1 10 Tf 40 760 Td 14 TL " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        objects.append(f"<< /Length {len(text)} >>\nstream\n{text}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out.encode("latin-1")))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out.encode("latin-1"))
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n" + "".join(f"{o:010d} 00000 n \n" for o in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+def make_report(rng, pages):
+    report = []
+    for page in range(pages):
+        lines = [f"Patient report - page {page + 1}"]
+        for name, unit, low, high in (ANALYTES if page == 0 else rng.sample(ANALYTES, 3)):
+            value = round(rng.uniform(low * 0.7, high * 1.4 if high else 10), 1)
+            flag = " H" if value > high else (" L" if value < low else "")
+            lines.append(f"{name} {value} {unit} {low} - {high}{flag}")
+        lines.extend(" ".join(rng.choices(FILLER, k=12)) for _ in range(30))
+        report.append(lines)
+    return _pdf_bytes(report)
+
+
+# --- measurement ---
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class RssSampler:
+    """Samples the server's resident set size from /proc (Linux only) in a background thread."""
+
+    def __init__(self, pid, interval=0.05):
+        self.path = f"/proc/{pid}/status"
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+
+    def read_kb(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
+
+    def reset_peak(self):
+        self.peak_kb = self.read_kb() or 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = self.read_kb()
+            if rss and rss > self.peak_kb:
+                self.peak_kb = rss
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+async def run_phase(name, requests_count, concurrency, make_request, sampler):
+    """Runs make_request(i) requests_count times with at most `concurrency` in flight."""
+    latencies, extra, errors = [], [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    rss_start = sampler.read_kb()
+    sampler.reset_peak()
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await make_request(i)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                return
+            latencies.append(time.perf_counter() - start)
+            if result is not None:
+                extra.append(result)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests_count)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    stats = {
+        "endpoint": name,
+        "requests": requests_count,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / requests_count, 4) if requests_count else 0.0,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": None,
+        "p95_ms": None,
+        "p99_ms": None,
+        "rss_start_mb": round(rss_start / 1024, 1) if rss_start else None,
+        "rss_peak_mb": round(sampler.peak_kb / 1024, 1) if sampler.peak_kb else None,
+    }
+    for p in (50, 95, 99):
+        value = _percentile(latencies, p)
+        stats[f"p{p}_ms"] = round(value * 1000, 1) if value is not None else None
+    if errors:
+        stats["sample_errors"] = sorted(set(errors))[:5]
+    print(
+        f"  {name:<16} {requests_count:>5} req  c={concurrency:<3} {stats['throughput_rps'] or 0:>8} req/s"
+        f"  p50 {stats['p50_ms']} ms  p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms"
+        f"  errors {stats['error_rate']:.1%}  rss {stats['rss_peak_mb']} MB"
+    )
+    return stats, extra
+
+
+# --- server under test ---
+
+def serve_app(port, embedder):
+    # Runs inside the subprocess: swap the embedder before the app is imported.
+    sys.path.insert(0, APP_DIR)
+    sys.path.insert(0, os.path.dirname(APP_DIR))
+    if embedder == "fake":
+        import embedding_cache
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        embedding_cache.cached_huggingface_embeddings = lambda model_name: embedding_cache.CachedEmbeddings(
+            DeterministicFakeEmbedding(size=384), model_name
+        )
+    import uvicorn
+    import new
+
+    uvicorn.run(new.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(args, groq_port, workdir):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        GROQ_API_KEY="fake",
+        GROQ_BASE_URL=f"http://127.0.0.1:{groq_port}",
+        QDRANT_URL=":memory:",
+        SESSION_DB_PATH=os.path.join(workdir, "sessions.sqlite3"),
+        EMBEDDING_CACHE_PATH=os.path.join(workdir, "embeddings.sqlite3"),
+        INGEST_WORKERS=str(args.ingest_workers),
+        MAX_PENDING_INGESTIONS=str(max(args.uploads, 16)),
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", str(port), "--embedder", args.embedder],
+        cwd=workdir,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("the app exited during startup")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("the app did not become ready in time")
+
+
+# --- load ---
+
+async def drive(args, base_url, sampler):
+    rng = random.Random(args.seed)
+    corpus = [make_report(rng, args.pages) for _ in range(args.reports)]
+    print(f"corpus: {len(corpus)} reports x {args.pages} pages, {sum(map(len, corpus)) / len(corpus) / 1024:.0f} KiB each")
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        results = []
+
+        async def upload(i):
+            # Cycling through the corpus makes every upload past the first round a duplicate.
+            files = {"file": (f"report_{i}.pdf", corpus[i % len(corpus)], "application/pdf")}
+            response = await client.post("/upload", files=files)
+            response.raise_for_status()
+            return response.json()["session_id"]
+
+        stats, session_ids = await run_phase("POST /upload", args.uploads, args.concurrency, upload, sampler)
+        results.append(stats)
+        if not session_ids:
+            return results
+
+        async def wait_ready(i):
+            # Time from the upload having returned until the session can be queried.
+            while True:
+                response = await client.get(f"/sessions/{session_ids[i]}/status")
+                response.raise_for_status()
+                status = response.json()
+                if status["status"] == "ready":
+                    return None
+                if status["status"] == "failed":
+                    raise RuntimeError(status["error"])
+                await asyncio.sleep(args.poll_interval)
+
+        stats, _ = await run_phase("ingest (ready)", len(session_ids), args.concurrency, wait_ready, sampler)
+        results.append(stats)
+
+        def chat_payload(i):
+            return {"query": QUERIES[i % len(QUERIES)], "session_id": session_ids[i % len(session_ids)], "mode": args.mode}
+
+        async def chat(i):
+            response = await client.post("/chat", json=chat_payload(i))
+            response.raise_for_status()
+            return None
+
+        stats, _ = await run_phase("POST /chat", args.chats, args.concurrency, chat, sampler)
+        results.append(stats)
+
+        async def chat_stream(i):
+            start = time.perf_counter()
+            first_step = None
+            async with client.stream("POST", "/chat/stream", json=chat_payload(i)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    if "error" in json.loads(line):
+                        raise RuntimeError(line)
+                    if first_step is None:
+                        first_step = time.perf_counter() - start
+            return first_step
+
+        stats, first_steps = await run_phase("POST /chat/stream", args.chats, args.concurrency, chat_stream, sampler)
+        first_steps.sort()
+        for p in (50, 95):
+            value = _percentile(first_steps, p)
+            stats[f"first_step_p{p}_ms"] = round(value * 1000, 1) if value is not None else None
+        print(f"  {'':<16} first step p50 {stats['first_step_p50_ms']} ms  p95 {stats['first_step_p95_ms']} ms")
+        results.append(stats)
+    return results
+
+
+def run(args):
+    groq_server, groq_stats = start_fake_groq(0, args.llm_latency_ms, args.token_delay_ms)
+    workdir = tempfile.mkdtemp(prefix="bloodwork-loadtest-")
+    process = None
+    try:
+        process, base_url = start_app(args, groq_server.server_port, workdir)
+        sampler = RssSampler(process.pid)
+        sampler.start()
+        print(f"app ready at {base_url} (pid {process.pid}), fake Groq at :{groq_server.server_port}")
+        endpoints = asyncio.run(drive(args, base_url, sampler))
+        sampler.stop()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        groq_server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"  fake Groq: {groq_stats.to_dict()}")
+    return {
+        "benchmark": "bloodwork_loadtest",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "uploads": args.uploads,
+            "chats": args.chats,
+            "concurrency": args.concurrency,
+            "reports": args.reports,
+            "pages": args.pages,
+            "mode": args.mode,
+            "embedder": args.embedder,
+            "ingest_workers": args.ingest_workers,
+            "llm_latency_ms": args.llm_latency_ms,
+            "token_delay_ms": args.token_delay_ms,
+            "seed": args.seed,
+        },
+        "endpoints": endpoints,
+        "llm": groq_stats.to_dict(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--chats", type=int, default=100, help="requests to each of /chat and /chat/stream")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--reports", type=int, default=10, help="distinct PDFs in the corpus")
+    parser.add_argument("--pages", type=int, default=5, help="pages per synthetic report")
+    parser.add_argument("--mode", choices=["single", "iterative"], default="single")
+    parser.add_argument("--embedder", choices=["fake", "minilm"], default="fake",
+                        help="'fake' isolates the service from model cost")
+    parser.add_argument("--ingest-workers", type=int, default=2)
+    parser.add_argument("--llm-latency-ms", type=int, default=300)
+    parser.add_argument("--token-delay-ms", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_app(args.serve, args.embedder)
+        return
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
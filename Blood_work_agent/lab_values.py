@@ -0,0 +1,276 @@
+"""Pulls (analyte, value, unit, reference range, flag) rows out of report text.
+
+Each report gets a small columnar LabTable, one row per analyte, so questions
+about a single test can be answered from the table directly or at least
+grounded in the exact numbers before any vector search or LLM call.
+"""
+import math
+import re
+from array import array
+from typing import NamedTuple, Optional
+
+# Canonical analyte -> spellings seen on reports (matched case-insensitively).
+ANALYTES = {
+    "hemoglobin": ["hemoglobin", "haemoglobin", "hgb", "hb"],
+    "hba1c": ["hba1c", "glycated hemoglobin", "glycosylated hemoglobin", "a1c"],
+    "glucose_fasting": [
+        "fasting blood sugar", "fasting glucose", "fasting plasma glucose", "fbs", "glucose fasting", "glucose, fasting",
+    ],
+    "glucose": ["glucose", "blood sugar"],
+    "total_cholesterol": ["total cholesterol", "cholesterol, total", "cholesterol total", "cholesterol"],
+    "ldl": ["ldl cholesterol", "ldl-c", "ldl"],
+    "hdl": ["hdl cholesterol", "hdl-c", "hdl"],
+    "vldl": ["vldl cholesterol", "vldl"],
+    "triglycerides": ["triglycerides", "triglyceride", "tg"],
+    "creatinine": ["serum creatinine", "creatinine"],
+    "urea": ["blood urea nitrogen", "bun", "urea"],
+    "uric_acid": ["uric acid"],
+    "sodium": ["sodium", "na+"],
+    "potassium": ["potassium", "k+"],
+    "chloride": ["chloride"],
+    "calcium": ["calcium"],
+    "alt": ["alt", "sgpt", "alanine aminotransferase"],
+    "ast": ["ast", "sgot", "aspartate aminotransferase"],
+    "alp": ["alkaline phosphatase", "alp"],
+    "bilirubin_total": ["total bilirubin", "bilirubin total", "bilirubin"],
+    "albumin": ["albumin"],
+    "total_protein": ["total protein"],
+    "tsh": ["tsh", "thyroid stimulating hormone"],
+    "t3": ["total t3", "t3"],
+    "t4": ["total t4", "t4"],
+    "vitamin_d": ["vitamin d", "vitamin d3", "25-oh vitamin d", "25(oh) vitamin d", "25 hydroxy vitamin d"],
+    "vitamin_b12": ["vitamin b12", "b12", "cobalamin"],
+    "ferritin": ["ferritin"],
+    "iron": ["serum iron", "iron"],
+    "wbc": ["total leucocyte count", "total leukocyte count", "white blood cells", "wbc", "tlc"],
+    "rbc": ["red blood cells", "rbc count", "rbc"],
+    "platelets": ["platelet count", "platelets", "plt"],
+    "hematocrit": ["hematocrit", "haematocrit", "hct", "pcv"],
+    "mcv": ["mcv"],
+    "mch": ["mch"],
+    "mchc": ["mchc"],
+    "esr": ["esr"],
+    "crp": ["c-reactive protein", "crp"],
+}
+
+# Longest spellings first, so "ldl cholesterol" wins over "cholesterol".
+_ALIASES = sorted(
+    ((alias, analyte) for analyte, aliases in ANALYTES.items() for alias in aliases),
+    key=lambda item: len(item[0]),
+    reverse=True,
+)
+_ALIAS_TO_ANALYTE = dict(_ALIASES)
+_ANALYTE_PATTERN = re.compile(
+    r"(?<![A-Za-z0-9])(" + "|".join(re.escape(alias) for alias, _ in _ALIASES) + r")(?![A-Za-z0-9])",
+    re.IGNORECASE,
+)
+
+# What may follow an analyte's name before its value: parenthesized method or
+# form notes ("Vitamin D (25-OH)", "HbA1c (NGSP)") and a few qualifier words.
+# Kept to a closed list so prose like "Glucose levels above 126" is not read as a result.
+_NAME_TAIL = re.compile(
+    r"(?:[\s,]*(?:\([^()\n]*\)|(?:serum|plasma|whole blood|blood|total|direct|random|fasting|calculated|level)(?![A-Za-z])))*",
+    re.IGNORECASE,
+)
+_NUMBER = r"\d+(?:\.\d+)?"
+# An H/L flag may sit between the value and its unit ("LDL 160 H mg/dL").
+_VALUE = re.compile(
+    r"^[\s:=\-]*(?P<value>" + _NUMBER + r")\s*"
+    r"(?:(?P<flag>HIGH|LOW|High|Low|H|L)\s+(?=[A-Za-zµμ%]))?"
+    r"(?P<unit>%|[A-Za-zµμ0-9^*/.]*[A-Za-zµμ][A-Za-zµμ0-9^*/.]*)?"
+)
+_RANGE = re.compile(r"(?P<low>" + _NUMBER + r")\s*(?:-|–|to)\s*(?P<high>" + _NUMBER + r")")
+_BOUND = re.compile(r"(?P<op><=|>=|<|>|≤|≥)\s*(?P<bound>" + _NUMBER + r")")
+_FLAG = re.compile(r"(?<![A-Za-z])(HIGH|LOW|ABNORMAL|CRITICAL|H|L)(?![A-Za-z])", re.IGNORECASE)
+_FLAG_NAMES = {"h": "high", "high": "high", "l": "low", "low": "low", "abnormal": "abnormal", "critical": "abnormal"}
+
+_ROUTINE_QUESTION = re.compile(
+    r"\b(high|low|normal|elevated|raised|deficient|level|levels|value|values|result|results|range|count|what is|what's|ok|okay)\b",
+    re.IGNORECASE,
+)
+MAX_ROUTINE_QUESTION_WORDS = 12
+
+
+class LabValue(NamedTuple):
+    analyte: str
+    name: str
+    value: float
+    unit: Optional[str]
+    ref_low: Optional[float]
+    ref_high: Optional[float]
+    flag: Optional[str]  # high | low | abnormal | normal | None
+
+
+def _parse_line(line: str) -> Optional[LabValue]:
+    match = _ANALYTE_PATTERN.search(line)
+    if match is None:
+        return None
+    name_end = _NAME_TAIL.match(line, match.end()).end()
+    rest = line[name_end:]
+    value_match = _VALUE.match(rest)
+    if value_match is None:
+        return None
+    value = float(value_match.group("value"))
+    unit = value_match.group("unit")
+    if unit and unit.lower() in _FLAG_NAMES:
+        # A bare "H"/"L" right after the number is the flag, not a unit.
+        unit = None
+        tail = rest[value_match.start("unit"):]
+    else:
+        tail = rest[value_match.end():]
+
+    ref_low = ref_high = None
+    range_match = _RANGE.search(tail)
+    if range_match:
+        ref_low, ref_high = float(range_match.group("low")), float(range_match.group("high"))
+        flag_text = tail[:range_match.start()] + " " + tail[range_match.end():]
+    else:
+        bound_match = _BOUND.search(tail)
+        if bound_match:
+            bound = float(bound_match.group("bound"))
+            if bound_match.group("op") in ("<", "<=", "≤"):
+                ref_high = bound
+            else:
+                ref_low = bound
+            flag_text = tail[:bound_match.start()] + " " + tail[bound_match.end():]
+        else:
+            flag_text = tail
+
+    flag_match = _FLAG.search(flag_text)
+    if value_match.group("flag"):
+        flag = _FLAG_NAMES[value_match.group("flag").lower()]
+    elif flag_match and (len(flag_match.group(1)) > 1 or flag_match.group(1).isupper()):
+        flag = _FLAG_NAMES[flag_match.group(1).lower()]
+    elif ref_high is not None and value > ref_high:
+        flag = "high"
+    elif ref_low is not None and value < ref_low:
+        flag = "low"
+    elif ref_low is not None or ref_high is not None:
+        flag = "normal"
+    else:
+        flag = None
+
+    return LabValue(
+        analyte=_ALIAS_TO_ANALYTE[match.group(1).lower()],
+        name=line[match.start(1):name_end].strip(" ,"),
+        value=value,
+        unit=unit,
+        ref_low=ref_low,
+        ref_high=ref_high,
+        flag=flag,
+    )
+
+
+def _optional(number: float) -> Optional[float]:
+    return None if math.isnan(number) else number
+
+
+class LabTable:
+    """One report's lab values stored column-wise, one row per analyte."""
+
+    def __init__(self):
+        self.analyte = []
+        self.name = []
+        self.value = array("d")
+        self.unit = []
+        self.ref_low = array("d")  # NaN when the report gives no bound
+        self.ref_high = array("d")
+        self.flag = []
+        self._rows = {}
+
+    def __len__(self):
+        return len(self.analyte)
+
+    def append(self, lab_value: LabValue):
+        # Reports repeat analytes in headers and summaries; the first reading wins.
+        if lab_value.analyte in self._rows:
+            return
+        self._rows[lab_value.analyte] = len(self.analyte)
+        self.analyte.append(lab_value.analyte)
+        self.name.append(lab_value.name)
+        self.value.append(lab_value.value)
+        self.unit.append(lab_value.unit)
+        self.ref_low.append(math.nan if lab_value.ref_low is None else lab_value.ref_low)
+        self.ref_high.append(math.nan if lab_value.ref_high is None else lab_value.ref_high)
+        self.flag.append(lab_value.flag)
+
+    def row(self, index: int) -> LabValue:
+        return LabValue(
+            self.analyte[index], self.name[index], self.value[index], self.unit[index],
+            _optional(self.ref_low[index]), _optional(self.ref_high[index]), self.flag[index],
+        )
+
+    def lookup(self, analytes):
+        return [self.row(self._rows[a]) for a in analytes if a in self._rows]
+
+    def to_dict(self):
+        return {
+            "analyte": self.analyte,
+            "name": self.name,
+            "value": self.value.tolist(),
+            "unit": self.unit,
+            # JSON has no NaN; missing bounds are stored as null.
+            "ref_low": [_optional(x) for x in self.ref_low],
+            "ref_high": [_optional(x) for x in self.ref_high],
+            "flag": self.flag,
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> "LabTable":
+        table = cls()
+        for row in zip(*(data[column] for column in LabValue._fields)):
+            table.append(LabValue(*row))
+        return table
+
+
+def extract_lab_values(texts) -> LabTable:
+    table = LabTable()
+    for text in texts:
+        for line in text.splitlines():
+            lab_value = _parse_line(line)
+            if lab_value is not None:
+                table.append(lab_value)
+    return table
+
+
+def find_analytes(text: str):
+    return list(dict.fromkeys(_ALIAS_TO_ANALYTE[m.group(1).lower()] for m in _ANALYTE_PATTERN.finditer(text)))
+
+
+def format_lab_value(lab_value: LabValue) -> str:
+    text = f"{lab_value.name}: {lab_value.value:g}"
+    if lab_value.unit:
+        text += f" {lab_value.unit}"
+    if lab_value.ref_low is not None and lab_value.ref_high is not None:
+        text += f" (reference {lab_value.ref_low:g}-{lab_value.ref_high:g})"
+    elif lab_value.ref_high is not None:
+        text += f" (reference < {lab_value.ref_high:g})"
+    elif lab_value.ref_low is not None:
+        text += f" (reference > {lab_value.ref_low:g})"
+    if lab_value.flag:
+        text += f" - {lab_value.flag.upper()}"
+    return text
+
+
+def answer_lab_question(query: str, table: LabTable) -> Optional[str]:
+    """Answers short "is my X high / what is my X" questions straight from the table.
+
+    Returns None when the question names an analyte the report doesn't have,
+    or asks for more than a reading, so the caller falls back to the LLM.
+    """
+    analytes = find_analytes(query)
+    if not analytes or len(query.split()) > MAX_ROUTINE_QUESTION_WORDS or not _ROUTINE_QUESTION.search(query):
+        return None
+    rows = table.lookup(analytes)
+    if len(rows) != len(analytes):
+        return None
+    lines = [format_lab_value(row) for row in rows]
+    flagged = [row.name for row in rows if row.flag in ("high", "low", "abnormal")]
+    unranged = [row.name for row in rows if row.flag is None]
+    if flagged:
+        lines.append(f"Outside the reference range: {', '.join(flagged)}. Please discuss these results with your doctor.")
+    elif not unranged:
+        lines.append("These values are within the reference range given in your report.")
+    if unranged:
+        lines.append(f"Your report gives no reference range for: {', '.join(unranged)}.")
+    return "\n".join(lines)
@@ -1,26 +1,200 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from pydantic import BaseModel
-from typing import List
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError, field_validator
+from typing import List, Literal, Optional
+import asyncio
+import hashlib
 import json
 import os
+import re
 from dotenv import load_dotenv
-import shutil
+import sys
+import threading
 import uuid
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
 # Langchain-related
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_qdrant import QdrantVectorStore
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from groq import Groq
+from groq import BadRequestError, Groq, UnprocessableEntityError
+from qdrant_client import QdrantClient, models
+
+# embedding_cache and parallel_pdf live at the repo root and are shared with the other bots.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_cache import cached_huggingface_embeddings
+from parallel_pdf import lazy_load_pdf
+from session_store import SessionStore, UploadBeingDeleted
+from lab_values import LabTable, answer_lab_question, extract_lab_values, find_analytes, format_lab_value
 
 # --- ENVIRONMENT SETUP ---
 load_dotenv()
 groq_api_key = os.getenv('GROQ_API_KEY')
 client = Groq(api_key=groq_api_key)
 
+# --- SHARED EMBEDDER ---
+# Loading MiniLM reads the tokenizer and weights from disk, so it happens once
+# per process and every upload reuses the same instance.
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_embedder = None
+_embedder_lock = threading.Lock()
+embedder_ready = threading.Event()
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = cached_huggingface_embeddings(EMBEDDING_MODEL)
+    return _embedder
+
+def warm_up_embedder():
+    # One forward pass, so the first upload doesn't pay for lazy initialisation either.
+    get_embedder().embed_query("warm-up")
+    embedder_ready.set()
+
+# --- VECTOR STORE ---
+# Every report lives in one collection, tagged with its upload hash and
+# searched through a payload filter, instead of one collection per upload.
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+SESSIONS_COLLECTION = "bloodwork_sessions"
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 60 * 60)))
+SWEEP_INTERVAL_SECONDS = int(os.getenv("SWEEP_INTERVAL_SECONDS", "600"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+# A processing upload whose progress hasn't moved for this long is taken as
+# abandoned (worker crash or restart) and may be ingested again.
+STALE_INGESTION_SECONDS = int(os.getenv("STALE_INGESTION_SECONDS", str(15 * 60)))
+# Ingestions queued or running in this process are heartbeated this often, so
+# a report waiting its turn in the pool never looks abandoned.
+HEARTBEAT_INTERVAL_SECONDS = max(1, STALE_INGESTION_SECONDS // 3)
+
+# location also accepts ":memory:" for an in-process Qdrant (local runs, the load test).
+qdrant = QdrantClient(location=QDRANT_URL)
+_collection_lock = threading.Lock()
+
+# Session metadata lives in SQLite rather than in this process, so any
+# uvicorn worker can serve any session and sessions survive restarts.
+sessions = SessionStore(
+    ttl_seconds=SESSION_TTL_SECONDS, max_sessions=MAX_SESSIONS, stale_after_seconds=STALE_INGESTION_SECONDS
+)
+
+def ensure_sessions_collection():
+    with _collection_lock:
+        if qdrant.collection_exists(SESSIONS_COLLECTION):
+            return
+        vector_size = len(get_embedder().embed_query("vector size probe"))
+        qdrant.create_collection(
+            collection_name=SESSIONS_COLLECTION,
+            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+        )
+        qdrant.create_payload_index(
+            collection_name=SESSIONS_COLLECTION,
+            field_name="metadata.upload_hash",
+            field_schema=models.PayloadSchemaType.KEYWORD,
+        )
+
+def upload_filter(upload_hash):
+    return models.Filter(
+        must=[models.FieldCondition(key="metadata.upload_hash", match=models.MatchValue(value=upload_hash))]
+    )
+
+def ingestion_filter(upload_hash, ingestion_id, same=True):
+    # Points one ingestion of a report stored (or, with same=False, every other ingestion's).
+    ingestion = models.FieldCondition(key="metadata.ingestion_id", match=models.MatchValue(value=ingestion_id))
+    return models.Filter(
+        must=[models.FieldCondition(key="metadata.upload_hash", match=models.MatchValue(value=upload_hash))]
+        + ([ingestion] if same else []),
+        must_not=[] if same else [ingestion],
+    )
+
+def delete_ingestion_points(upload_hash, ingestion_id, same=True):
+    if qdrant.collection_exists(SESSIONS_COLLECTION):
+        qdrant.delete(
+            collection_name=SESSIONS_COLLECTION,
+            points_selector=models.FilterSelector(filter=ingestion_filter(upload_hash, ingestion_id, same)),
+        )
+
+def upload_path(upload_hash, ingestion_id):
+    # One file per ingestion, so a sweep of an old one can't remove a re-upload's file.
+    return f"{UPLOAD_DIR}/{upload_hash}-{ingestion_id}.pdf"
+
+_vector_stores = {}
+
+def get_vector_store(collection_name):
+    # Vector stores are thin wrappers around the client, so one per collection is shared by all sessions.
+    if collection_name not in _vector_stores:
+        _vector_stores[collection_name] = QdrantVectorStore(
+            client=qdrant, collection_name=collection_name, embedding=get_embedder()
+        )
+    return _vector_stores[collection_name]
+
+class SessionRetriever:
+    """Similarity search over the shared collection, restricted to one report's chunks."""
+
+    def __init__(self, vector_store, upload_hash):
+        self.vector_store = vector_store
+        self.upload_hash = upload_hash
+
+    def similarity_search(self, query, k=4):
+        return self.vector_store.similarity_search(query, k=k, filter=upload_filter(self.upload_hash))
+
+def get_retriever(record):
+    # Rebuilt from the stored metadata on every request; nothing per-session is kept in memory.
+    return SessionRetriever(get_vector_store(record.collection), record.upload_hash)
+
+def sweep_expired_sessions():
+    sessions.fail_stale_ingestions()
+    expired = sessions.expired()
+    # Reports are shared between sessions; only those no session refers to any
+    # more are dropped. They stay in the deleting state, which uploads of the
+    # same report wait out, until their vectors and file are gone. Everything
+    # is removed by ingestion, so a sweep that races another worker's purge
+    # and a fresh upload of the same report leaves the new ingestion alone.
+    orphaned = set(sessions.delete(expired)) if expired else set()
+    orphaned.update(sessions.deleting())
+    if not orphaned:
+        return
+    for upload_hash, ingestion_id in orphaned:
+        delete_ingestion_points(upload_hash, ingestion_id)
+        path = upload_path(upload_hash, ingestion_id)
+        if os.path.exists(path):
+            os.remove(path)
+    sessions.purge(orphaned)
+
+def run_sweeper(stop):
+    while not stop.wait(SWEEP_INTERVAL_SECONDS):
+        try:
+            sweep_expired_sessions()
+        except Exception as e:
+            print(f"Session sweep failed: {e}")
+
+def run_heartbeat(stop):
+    while not stop.wait(HEARTBEAT_INTERVAL_SECONDS):
+        try:
+            with _pending_lock:
+                pending = list(_pending_ingestions)
+            sessions.heartbeat(pending)
+        except Exception as e:
+            print(f"Ingestion heartbeat failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background: the server starts accepting requests at once
+    # and /ready reports when the model is loaded.
+    asyncio.get_running_loop().run_in_executor(None, warm_up_embedder)
+    # Ingestions a previous run left in processing will never finish.
+    sessions.fail_stale_ingestions()
+    stop_sweeper = threading.Event()
+    threading.Thread(target=run_sweeper, args=(stop_sweeper,), name="session-sweeper", daemon=True).start()
+    threading.Thread(target=run_heartbeat, args=(stop_sweeper,), name="ingestion-heartbeat", daemon=True).start()
+    yield
+    stop_sweeper.set()
+
 # --- FASTAPI APP ---
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # --- SYSTEM PROMPT ---
 system_prompt = """You are Bloodwork BOT, an intelligent Doctor assistant trained specifically on the official bloodwork from the context provided.
@@ -106,14 +280,39 @@ Example Question and answers:-
   }
 ]"""
 
-# --- Global State (in-memory) ---
-db_collections = {}  # store user-specific retrievers
+# Sent with single-pass requests: the whole workflow comes back in one reply
+# instead of one round trip per step.
+single_pass_instruction = """Return ALL the steps of the workflow in this one reply, as a single JSON object of the form:
+{"steps": [{"step": "plan", "content": "..."}, {"step": "analyze", "content": "..."}, ..., {"step": "output", "content": "..."}]}
+The last step MUST be "output"."""
+
+CHAT_MODEL = "llama-3.3-70b-versatile"
+
+# --- Ingestion ---
+# PDFs are parsed, embedded and uploaded by a bounded pool of worker threads so
+# /upload returns at once and /chat keeps being served while reports ingest.
+UPLOAD_DIR = "./uploaded_reports"
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+MAX_PENDING_INGESTIONS = int(os.getenv("MAX_PENDING_INGESTIONS", "16"))
+EMBED_BATCH_SIZE = 64
+
+ingestion_pool = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+# (upload_hash, ingestion_id) submitted to the pool and not finished yet.
+_pending_ingestions = set()
+_pending_lock = threading.Lock()
+
+class IngestionCancelled(Exception):
+    """The upload was deleted, or ingested again, while this ingestion was running."""
 
 # --- Request/Response Schemas ---
 
 class ChatRequest(BaseModel):
     query: str
     session_id: str
+    # "single" asks for every step in one call and falls back to "iterative"
+    # (one call per step) if the reply doesn't validate.
+    mode: Literal["single", "iterative"] = "single"
 
 class ChatResponse(BaseModel):
     responses: List[dict]
@@ -122,12 +321,73 @@ class UploadResponse(BaseModel):
     session_id: str
     message: str
 
+class SessionStatusResponse(BaseModel):
+    session_id: str
+    status: str
+    ready: bool
+    pages_parsed: int
+    chunks_embedded: int
+    error: Optional[str] = None
+
+class Step(BaseModel):
+    step: str
+    content: str
+
+class StepList(BaseModel):
+    steps: List[Step]
+
+    @field_validator("steps")
+    @classmethod
+    def ends_with_output(cls, steps):
+        if not steps or steps[-1].step.lower() != "output":
+            raise ValueError('the last step must be "output"')
+        return steps
+
+class StepStreamParser:
+    """Pulls complete step objects out of a streamed {"steps": [...]} reply as soon as each one closes."""
+
+    _STEPS_START = re.compile(r'"steps"\s*:\s*\[')
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = None  # just inside the steps array, once it has been seen
+        self.done = False
+        self.decoder = json.JSONDecoder()
+
+    def feed(self, text):
+        self.buffer += text
+        steps = []
+        if self.position is None:
+            match = self._STEPS_START.search(self.buffer)
+            if match is None:
+                return steps
+            self.position = match.end()
+        while not self.done:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \t\r\n,":
+                self.position += 1
+            if self.position >= len(self.buffer):
+                break
+            if self.buffer[self.position] == "]":
+                self.done = True
+                break
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                break  # the object isn't closed yet
+            self.position = end
+            try:
+                steps.append(Step.model_validate(value).model_dump())
+            except ValidationError:
+                self.done = True
+        return steps
+
 # --- Bloodwork Assistant Class ---
 
 class BloodworkAssistant:
-    def __init__(self, retriever):
+    def __init__(self, retriever, lab_values=()):
         self.client = client
         self.retriever = retriever
+        self.lab_values = lab_values
         self.messages = [
             {"role": "system", "content": system_prompt}
         ]
@@ -135,9 +395,13 @@ class BloodworkAssistant:
     def get_context_for_query(self, query):
         relevant_docs = self.retriever.similarity_search(query)
         context_text = "\n\n".join(doc.page_content for doc in relevant_docs)
+        if self.lab_values:
+            # Exact readings from the report, so the model doesn't have to find them in the chunks.
+            lab_text = "\n".join(format_lab_value(lab_value) for lab_value in self.lab_values)
+            context_text = f"Lab values extracted from the report:\n{lab_text}\n\n{context_text}"
         return context_text
 
-    def chat(self, query):
+    def prepare(self, query):
         # Fetch context
         context = self.get_context_for_query(query)
 
@@ -145,13 +409,76 @@ class BloodworkAssistant:
         self.messages.append({"role": "user", "content": query})
         self.messages.append({"role": "assistant", "content": f"Relevant documentation context:\n\n{context}"})
 
+    def chat(self, query, mode="single"):
+        self.prepare(query)
+        if mode == "single":
+            outputs = self.chat_single_pass()
+            if outputs is not None:
+                return outputs
+        return self.chat_iterative()
+
+    def stream_chat(self, query, mode="single"):
+        """Yields each step as soon as the model has finished writing it.
+
+        If the streamed single-pass reply stops short of an "output" step,
+        the iterative loop carries on from the steps already sent.
+        """
+        self.prepare(query)
+        steps = []
+        if mode == "single":
+            for step in self.stream_single_pass():
+                steps.append(step)
+                yield step
+            if steps and steps[-1]["step"].lower() == "output":
+                return
+        for step in steps:
+            self.messages.append({"role": "assistant", "content": json.dumps(step)})
+            self.messages.append({"role": "user", "content": "Continue with the next step."})
+        yield from self.iter_steps()
+
+    def stream_single_pass(self):
+        # Groq's json_object mode can't be streamed, so the schema is only
+        # enforced by the prompt here and by the parser on the way out.
+        stream = self.client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=self.messages + [{"role": "user", "content": single_pass_instruction}],
+            stream=True,
+        )
+        parser = StepStreamParser()
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield from parser.feed(delta)
+
+    def chat_single_pass(self):
+        # One request for the whole workflow; None means the reply didn't
+        # match the schema and the caller should fall back to iterative mode.
+        try:
+            response = self.client.chat.completions.create(
+                model=CHAT_MODEL,
+                response_format={"type": "json_object"},
+                messages=self.messages + [{"role": "user", "content": single_pass_instruction}],
+            )
+        except (BadRequestError, UnprocessableEntityError):
+            # Groq refuses a generation that isn't valid JSON itself (json_validate_failed).
+            return None
+        response_content = response.choices[0].message.content
+        try:
+            parsed_output = StepList.model_validate_json(response_content)
+        except ValidationError:
+            return None
+        return [step.model_dump() for step in parsed_output.steps]
+
+    def chat_iterative(self):
+        return list(self.iter_steps())
+
+    def iter_steps(self):
         conversation_active = True
-        outputs = []
         current_step = None
 
         while conversation_active:
             response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+                model=CHAT_MODEL,
                 response_format={"type": "json_object"},
                 messages=self.messages,
             )
@@ -166,20 +493,29 @@ class BloodworkAssistant:
             self.messages.append({"role": "assistant", "content": response_content})
 
             step = parsed_output.get("step", "").lower()
-            outputs.append(parsed_output)
+            yield parsed_output
 
             if step == "output":
                 conversation_active = False
             else:
                 self.messages.append({"role": "user", "content": "Continue with the next step."})
 
-        return outputs
-
 # --- Utility Functions ---
 
-def process_pdf(file_path, session_id):
-    loader = PyPDFLoader(file_path=file_path)
-    docs = loader.load()
+def process_pdf(file_path, upload_hash, ingestion_id):
+    def progress(**counts):
+        # Stops the ingestion as soon as the upload is no longer its own.
+        if not sessions.update_progress(upload_hash, ingestion_id, **counts):
+            raise IngestionCancelled(upload_hash)
+
+    docs = []
+    for page in lazy_load_pdf(file_path):
+        docs.append(page)
+        progress(pages_parsed=len(docs))
+
+    # Pull the lab values into their own table for direct lookups.
+    if not sessions.save_lab_table(upload_hash, ingestion_id, extract_lab_values(doc.page_content for doc in docs).to_dict()):
+        raise IngestionCancelled(upload_hash)
 
     # Split text
     splitter = RecursiveCharacterTextSplitter(
@@ -188,59 +524,173 @@ def process_pdf(file_path, session_id):
     )
     split_docs = splitter.split_documents(docs)
 
-    # Embed and Store
-    embedder = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    collection_name = f"Bloodwork_db_{session_id}"
-    
-    QdrantVectorStore.from_documents(
-        documents=split_docs,
-        url="http://localhost:6333",
-        collection_name=collection_name,
-        embedding=embedder
-    )
-
-    retriever = QdrantVectorStore.from_existing_collection(
-        url="http://localhost:6333",
-        collection_name=collection_name,
-        embedding=embedder
-    )
-
-    return retriever
+    # Tag every chunk so it can be filtered and swept by report and by ingestion.
+    for doc in split_docs:
+        doc.metadata["upload_hash"] = upload_hash
+        doc.metadata["ingestion_id"] = ingestion_id
+
+    if not split_docs:
+        raise ValueError("No text could be extracted from the PDF.")
+
+    # Embed and Store in batches, so chunks_embedded moves while a long
+    # report is being embedded.
+    ensure_sessions_collection()
+    # Chunks a failed or abandoned earlier ingestion of this report left behind.
+    delete_ingestion_points(upload_hash, ingestion_id, same=False)
+    vector_store = get_vector_store(SESSIONS_COLLECTION)
+    for i in range(0, len(split_docs), EMBED_BATCH_SIZE):
+        batch = split_docs[i:i + EMBED_BATCH_SIZE]
+        ids = [str(uuid.uuid5(uuid.NAMESPACE_URL, f"{upload_hash}:{ingestion_id}:{i + j}")) for j in range(len(batch))]
+        vector_store.add_documents(batch, ids=ids)
+        # Checked after every batch is stored: a batch that lands after the
+        # upload was dropped is cleaned up by ingest_report.
+        progress(chunks_embedded=i + len(batch))
+
+    return SessionRetriever(vector_store, upload_hash)
+
+@lru_cache(maxsize=1024)
+def get_lab_table(upload_hash):
+    # Only read once a report is ready, after which its table never changes.
+    columns = sessions.get_lab_table(upload_hash)
+    return LabTable.from_dict(columns) if columns else None
+
+def ingest_report(file_path, upload_hash, ingestion_id):
+    try:
+        process_pdf(file_path, upload_hash, ingestion_id)
+        if not sessions.mark_ready(upload_hash, ingestion_id):
+            raise IngestionCancelled(upload_hash)
+    except IngestionCancelled:
+        # Whatever this ingestion stored after the sweeper or a re-upload took its upload over.
+        delete_ingestion_points(upload_hash, ingestion_id)
+    except Exception as e:
+        sessions.mark_failed(upload_hash, ingestion_id, str(e))
+    finally:
+        with _pending_lock:
+            _pending_ingestions.discard((upload_hash, ingestion_id))
 
 # --- API Endpoints ---
 
+@app.get("/ready")
+def readiness():
+    if not embedder_ready.is_set():
+        raise HTTPException(status_code=503, detail="Embedding model is still loading.")
+    return {"ready": True, "embedding_model": EMBEDDING_MODEL}
+
 @app.post("/upload", response_model=UploadResponse)
 async def upload_file(file: UploadFile = File(...)):
     # Save the file locally
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
 
-    session_id = str(uuid.uuid4())
-    save_path = f"./uploaded_reports/{session_id}.pdf"
-
-    os.makedirs("./uploaded_reports", exist_ok=True)
-
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Process PDF and setup retriever
-    retriever = process_pdf(save_path, session_id)
+    if sessions.count_processing() >= MAX_PENDING_INGESTIONS:
+        raise HTTPException(status_code=503, detail="Too many reports are being processed. Please retry shortly.")
 
-    # Save retriever into memory
-    db_collections[session_id] = retriever
+    session_id = str(uuid.uuid4())
+    part_path = f"{UPLOAD_DIR}/{session_id}.part"
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+    # Stream the upload to disk in chunks instead of buffering it whole,
+    # hashing it on the way so re-uploads of the same report can be spotted.
+    digest = hashlib.sha256()
+    with open(part_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+    upload_hash = digest.hexdigest()
+
+    try:
+        record, ingestion_id = sessions.create(session_id, SESSIONS_COLLECTION, upload_hash)
+    except UploadBeingDeleted:
+        os.remove(part_path)
+        raise HTTPException(status_code=503, detail="This report is being cleared from an expired session. Please retry shortly.")
+    if ingestion_id is None:
+        # Already indexed (or being indexed): the session shares that index.
+        os.remove(part_path)
+        return UploadResponse(
+            session_id=session_id,
+            message="✅ File uploaded! This report was already processed." if record.ready
+            else "✅ File uploaded! Processing has started."
+        )
+
+    # Parse, embed and store in the background; poll /sessions/{id}/status.
+    save_path = upload_path(upload_hash, ingestion_id)
+    os.replace(part_path, save_path)
+    with _pending_lock:
+        _pending_ingestions.add((upload_hash, ingestion_id))
+    ingestion_pool.submit(ingest_report, save_path, upload_hash, ingestion_id)
 
     return UploadResponse(
         session_id=session_id,
-        message="✅ File uploaded and processed successfully!"
+        message="✅ File uploaded! Processing has started."
+    )
+
+@app.get("/sessions/{session_id}/status", response_model=SessionStatusResponse)
+def session_status_endpoint(session_id: str):
+    status = sessions.get(session_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Session ID not found. Please upload a report first.")
+    return SessionStatusResponse(
+        session_id=session_id,
+        status=status.state,
+        ready=status.ready,
+        pages_parsed=status.pages_parsed,
+        chunks_embedded=status.chunks_embedded,
+        error=status.error,
     )
 
+def get_ready_session(session_id):
+    status = sessions.get(session_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Session ID not found. Please upload a report first.")
+    if not status.ready:
+        detail = f"Report processing failed: {status.error}" if status.state == "failed" else "Report is still being processed."
+        raise HTTPException(status_code=409, detail=detail)
+
+    sessions.touch(session_id)
+    return status
+
+def lab_table_answer(query, status):
+    """Returns (answer, lab_values): a direct answer from the lab table, or the readings to ground the LLM with."""
+    lab_table = get_lab_table(status.upload_hash)
+    if lab_table is None:
+        return None, []
+    answer = answer_lab_question(query, lab_table)
+    if answer is not None:
+        return answer, []
+    return None, lab_table.lookup(find_analytes(query))
+
 @app.post("/chat", response_model=ChatResponse)
 def chat_endpoint(request: ChatRequest):
-    session_id = request.session_id
+    status = get_ready_session(request.session_id)
 
-    if session_id not in db_collections:
-        raise HTTPException(status_code=404, detail="Session ID not found. Please upload a report first.")
+    # Routine questions about one reading are answered from the lab table;
+    # otherwise the matching readings ground the LLM answer.
+    answer, lab_values = lab_table_answer(request.query, status)
+    if answer is not None:
+        return {"responses": [{"step": "output", "content": answer}]}
 
-    assistant = BloodworkAssistant(db_collections[session_id])
-    outputs = assistant.chat(request.query)
+    assistant = BloodworkAssistant(get_retriever(status), lab_values)
+    outputs = assistant.chat(request.query, mode=request.mode)
     return {"responses": outputs}
+
+@app.post("/chat/stream")
+def chat_stream_endpoint(request: ChatRequest):
+    """Same as /chat, but sends each step as one NDJSON line as soon as it is generated."""
+    status = get_ready_session(request.session_id)
+    answer, lab_values = lab_table_answer(request.query, status)
+
+    def ndjson_steps():
+        if answer is not None:
+            yield json.dumps({"step": "output", "content": answer}) + "\n"
+            return
+        assistant = BloodworkAssistant(get_retriever(status), lab_values)
+        try:
+            for step in assistant.stream_chat(request.query, mode=request.mode):
+                yield json.dumps(step) + "\n"
+        except Exception as e:
+            # Headers are already sent, so errors travel in the stream.
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            yield json.dumps({"error": detail}) + "\n"
+
+    return StreamingResponse(ndjson_steps(), media_type="application/x-ndjson")
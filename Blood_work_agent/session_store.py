@@ -0,0 +1,314 @@
+"""Session registry for the Bloodwork API, kept in SQLite.
+
+Only metadata is stored (collection, upload hash, ingestion progress and
+timestamps), never retriever objects, so every uvicorn worker sees the same
+sessions and they survive restarts. Sessions are evicted by TTL on their
+last use and, past max_sessions, least recently used first.
+
+Ingestion state belongs to the upload, keyed by the PDF's content hash, and
+any number of sessions can point at one upload. An upload is only dropped
+once the last session referring to it is evicted. Ingestion bumps the
+upload's updated_at as it goes; a processing upload whose heartbeat is older
+than stale_after_seconds (its worker crashed or was restarted) is marked
+failed, so the report can be ingested again.
+
+Every ingestion of an upload gets its own ingestion_id. Progress, results and
+deletion all name it, so an ingestion that lost its upload (deleted, or
+ingested again after going stale) can't write over the one that replaced it.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+DEFAULT_DB_PATH = os.getenv("SESSION_DB_PATH", "./bloodwork_sessions.sqlite3")
+SCHEMA_VERSION = 4
+STALE_INGESTION_ERROR = "Processing was interrupted. Please upload the report again."
+
+
+class UploadBeingDeleted(Exception):
+    """The upload's vectors and file are being removed; it can be uploaded again once that is done."""
+
+
+class SessionRecord(NamedTuple):
+    session_id: str
+    collection: str
+    upload_hash: str
+    state: str  # processing -> ready | failed; deleting once no session refers to it
+    pages_parsed: int
+    chunks_embedded: int
+    error: Optional[str]
+    created_at: float
+    last_used_at: float
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+
+class SessionStore:
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        ttl_seconds: int = 24 * 60 * 60,
+        max_sessions: int = 1000,
+        stale_after_seconds: int = 15 * 60,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.stale_after_seconds = stale_after_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL lets the other workers read while one of them writes.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # Sessions are short-lived, so an older layout is simply dropped.
+            for table in ("sessions", "uploads", "lab_tables"):
+                self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " upload_hash TEXT PRIMARY KEY,"
+            " collection TEXT NOT NULL,"
+            " ingestion_id TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " pages_parsed INTEGER NOT NULL DEFAULT 0,"
+            " chunks_embedded INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " upload_hash TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used_at REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_upload ON sessions (upload_hash)")
+        # Lab values extracted from each report, as one JSON object of columns.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lab_tables ("
+            " upload_hash TEXT PRIMARY KEY,"
+            " columns TEXT NOT NULL"
+            ")"
+        )
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def create(self, session_id: str, collection: str, upload_hash: str):
+        """Adds a session for upload_hash; returns (record, ingestion_id).
+
+        ingestion_id is set when the upload still has to be ingested and None
+        when the session shares an upload that is already ready or being
+        processed, so the report is parsed and embedded once however often it
+        is uploaded. A processing upload with a stale heartbeat is ingested
+        again. Raises UploadBeingDeleted while the sweeper is removing the
+        hash's vectors.
+        """
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two workers can't
+            # both decide they are the first to see this hash.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT state, updated_at FROM uploads WHERE upload_hash = ?", (upload_hash,)
+                ).fetchone()
+                if row is not None and row[0] == "deleting":
+                    raise UploadBeingDeleted(upload_hash)
+                stale = row is not None and row[0] == "processing" and row[1] < now - self.stale_after_seconds
+                ingestion_id = None
+                if row is None or row[0] == "failed" or stale:
+                    ingestion_id = uuid.uuid4().hex
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO uploads"
+                        " (upload_hash, collection, ingestion_id, state, created_at, updated_at)"
+                        " VALUES (?, ?, ?, 'processing', ?, ?)",
+                        (upload_hash, collection, ingestion_id, now, now),
+                    )
+                self._conn.execute(
+                    "INSERT INTO sessions (session_id, upload_hash, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                    (session_id, upload_hash, now, now),
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return self.get(session_id), ingestion_id
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT s.session_id, u.collection, u.upload_hash, u.state, u.pages_parsed, u.chunks_embedded,"
+                " u.error, s.created_at, s.last_used_at"
+                " FROM sessions s JOIN uploads u ON u.upload_hash = s.upload_hash WHERE s.session_id = ?",
+                (session_id,),
+            ).fetchone()
+        return SessionRecord(*row) if row else None
+
+    def touch(self, session_id: str):
+        self._execute("UPDATE sessions SET last_used_at = ? WHERE session_id = ?", (time.time(), session_id))
+
+    # update_progress, mark_ready and mark_failed only touch the upload while
+    # ingestion_id is still its live ingestion, and return False once it isn't.
+
+    def update_progress(
+        self, upload_hash: str, ingestion_id: str, pages_parsed: int = None, chunks_embedded: int = None
+    ) -> bool:
+        # Doubles as the ingestion heartbeat.
+        cursor = self._execute(
+            "UPDATE uploads SET pages_parsed = COALESCE(?, pages_parsed),"
+            " chunks_embedded = COALESCE(?, chunks_embedded), updated_at = ?"
+            " WHERE upload_hash = ? AND ingestion_id = ? AND state = 'processing'",
+            (pages_parsed, chunks_embedded, time.time(), upload_hash, ingestion_id),
+        )
+        return cursor.rowcount > 0
+
+    def mark_ready(self, upload_hash: str, ingestion_id: str) -> bool:
+        cursor = self._execute(
+            "UPDATE uploads SET state = 'ready', updated_at = ?"
+            " WHERE upload_hash = ? AND ingestion_id = ? AND state = 'processing'",
+            (time.time(), upload_hash, ingestion_id),
+        )
+        return cursor.rowcount > 0
+
+    def mark_failed(self, upload_hash: str, ingestion_id: str, error: str) -> bool:
+        cursor = self._execute(
+            "UPDATE uploads SET state = 'failed', error = ?, updated_at = ?"
+            " WHERE upload_hash = ? AND ingestion_id = ? AND state = 'processing'",
+            (error, time.time(), upload_hash, ingestion_id),
+        )
+        return cursor.rowcount > 0
+
+    def heartbeat(self, ingestions):
+        """Keeps (upload_hash, ingestion_id) pairs that are queued or running from going stale."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE uploads SET updated_at = ? WHERE upload_hash = ? AND ingestion_id = ? AND state = 'processing'",
+                [(now, upload_hash, ingestion_id) for upload_hash, ingestion_id in ingestions],
+            )
+            self._conn.commit()
+
+    def fail_stale_ingestions(self) -> int:
+        """Marks processing uploads whose heartbeat stopped (crashed or restarted worker) as failed."""
+        cursor = self._execute(
+            "UPDATE uploads SET state = 'failed', error = ? WHERE state = 'processing' AND updated_at < ?",
+            (STALE_INGESTION_ERROR, time.time() - self.stale_after_seconds),
+        )
+        return cursor.rowcount
+
+    def save_lab_table(self, upload_hash: str, ingestion_id: str, columns: dict) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR REPLACE INTO lab_tables (upload_hash, columns)"
+                " SELECT upload_hash, ? FROM uploads WHERE upload_hash = ? AND ingestion_id = ? AND state = 'processing'",
+                (json.dumps(columns), upload_hash, ingestion_id),
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def get_lab_table(self, upload_hash: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT columns FROM lab_tables WHERE upload_hash = ?", (upload_hash,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count_processing(self) -> int:
+        # Stale rows are not counted, so dead ingestions can't hold up new uploads.
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM uploads WHERE state = 'processing' AND updated_at >= ?",
+                (time.time() - self.stale_after_seconds,),
+            ).fetchone()[0]
+
+    def expired(self, now: float = None):
+        """Sessions past the TTL, plus the least recently used ones beyond max_sessions."""
+        now = time.time() if now is None else now
+        with self._lock:
+            stale = self._conn.execute(
+                "SELECT session_id FROM sessions WHERE last_used_at < ?", (now - self.ttl_seconds,)
+            ).fetchall()
+            # Reports still being ingested are never evicted for capacity.
+            overflow = self._conn.execute(
+                "SELECT s.session_id FROM sessions s JOIN uploads u ON u.upload_hash = s.upload_hash"
+                " WHERE u.state != 'processing' AND s.last_used_at >= ?"
+                " ORDER BY s.last_used_at DESC LIMIT -1 OFFSET ?",
+                (now - self.ttl_seconds, self.max_sessions),
+            ).fetchall()
+        return [row[0] for row in stale + overflow]
+
+    def delete(self, session_ids):
+        """Deletes the sessions and returns (upload_hash, ingestion_id) of the uploads no session refers to any more.
+
+        Those uploads are left in the deleting state, which create() refuses,
+        until purge() is called once their vectors and file are gone.
+        """
+        with self._lock:
+            # Same write lock as create(), so no session can attach to an upload being dropped.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                hashes = set()
+                for session_id in session_ids:
+                    row = self._conn.execute("SELECT upload_hash FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                    if row:
+                        hashes.add(row[0])
+                    self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                orphaned = [
+                    upload_hash for upload_hash in hashes
+                    if self._conn.execute("SELECT 1 FROM sessions WHERE upload_hash = ? LIMIT 1", (upload_hash,)).fetchone() is None
+                ]
+                self._conn.executemany("UPDATE uploads SET state = 'deleting' WHERE upload_hash = ?", [(h,) for h in orphaned])
+                orphaned = [
+                    self._conn.execute(
+                        "SELECT upload_hash, ingestion_id FROM uploads WHERE upload_hash = ?", (upload_hash,)
+                    ).fetchone()
+                    for upload_hash in orphaned
+                ]
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return [tuple(row) for row in orphaned if row is not None]
+
+    def deleting(self):
+        """(upload_hash, ingestion_id) of uploads left in the deleting state, e.g. by a sweep that failed halfway."""
+        with self._lock:
+            return [
+                tuple(row)
+                for row in self._conn.execute("SELECT upload_hash, ingestion_id FROM uploads WHERE state = 'deleting'")
+            ]
+
+    def purge(self, uploads):
+        """Drops deleting uploads, as (upload_hash, ingestion_id), once their vectors and file have been removed.
+
+        An upload that has since been purged and uploaded again has a new
+        ingestion_id and is left alone.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for upload_hash, ingestion_id in uploads:
+                    if self._conn.execute(
+                        "DELETE FROM uploads WHERE upload_hash = ? AND ingestion_id = ? AND state = 'deleting'",
+                        (upload_hash, ingestion_id),
+                    ).rowcount:
+                        self._conn.execute("DELETE FROM lab_tables WHERE upload_hash = ?", (upload_hash,))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
@@ -1,8 +1,72 @@
 import streamlit as st
 import requests
+import json
+import time
+import uuid
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 FASTAPI_URL = "https://chatbot-bloodwork-1.onrender.com"
 
+# (connect, read) timeouts in seconds.
+TIMEOUT = (10, 60)
+CHAT_TIMEOUT = (10, 180)
+UPLOAD_CHUNK_BYTES = 256 * 1024
+# Polls of /sessions/{id}/status, one per POLL_INTERVAL seconds, before giving up on processing.
+POLL_INTERVAL = 1
+MAX_STATUS_POLLS = 300
+
+@st.cache_resource
+def get_http_session():
+    # One pooled keep-alive session for the whole app, instead of a new
+    # TCP + TLS handshake with the backend on every rerun.
+    session = requests.Session()
+    # Connection errors are retried for every method; 502/503/504 (e.g. while
+    # Render wakes the backend up) only for GETs, so a POST is never sent twice.
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"}))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class MultipartFileStream:
+    """A multipart/form-data body that is read from the uploaded file chunk by chunk.
+
+    It has a length, so requests sends a Content-Length instead of buffering
+    the whole PDF, and on_progress is called as each chunk goes out.
+    """
+
+    def __init__(self, field, file, filename, content_type, size, on_progress):
+        self.boundary = uuid.uuid4().hex
+        self.file = file
+        self.size = size
+        self.on_progress = on_progress
+        self.head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return len(self.head) + self.size + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        sent = 0
+        self.file.seek(0)
+        while chunk := self.file.read(UPLOAD_CHUNK_BYTES):
+            sent += len(chunk)
+            self.on_progress(sent / self.size if self.size else 1.0)
+            yield chunk
+        yield self.tail
+
+http = get_http_session()
+
 st.title("🩺 Bloodwork Assistant Dashboard")
 
 # --- Session state ---
@@ -16,13 +80,45 @@ uploaded_file = st.file_uploader("Choose a PDF file", type=["pdf"])
 
 if uploaded_file is not None:
     if st.button("Upload"):
-        files = {"file": (uploaded_file.name, uploaded_file, "application/pdf")}
-        response = requests.post(f"{FASTAPI_URL}/upload", files=files)
+        progress = st.progress(0.0, text="Uploading...")
+        body = MultipartFileStream(
+            "file", uploaded_file, uploaded_file.name, "application/pdf", uploaded_file.size,
+            on_progress=lambda done: progress.progress(done, text=f"Uploading... {done:.0%}"),
+        )
+        try:
+            response = http.post(
+                f"{FASTAPI_URL}/upload", data=body, headers={"Content-Type": body.content_type}, timeout=TIMEOUT
+            )
+        except requests.RequestException:
+            response = None
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             data = response.json()
-            st.session_state.session_id = data["session_id"]
-            st.success(f"File uploaded! Session ID: {st.session_state.session_id}")
+            progress.progress(1.0, text="Uploaded")
+            # The report is processed in the background; wait until it can be queried.
+            status, problem = None, "Processing took too long. Please try again later."
+            with st.spinner("Processing your report..."):
+                for _ in range(MAX_STATUS_POLLS):
+                    try:
+                        status_response = http.get(f"{FASTAPI_URL}/sessions/{data['session_id']}/status", timeout=TIMEOUT)
+                    except requests.RequestException:
+                        status, problem = None, "Could not reach the server while processing your report."
+                        break
+                    if status_response.status_code != 200:
+                        status, problem = None, f"Could not check processing status (HTTP {status_response.status_code})."
+                        break
+                    status = status_response.json()
+                    if status.get("status") != "processing":
+                        break
+                    status = None
+                    time.sleep(POLL_INTERVAL)
+            if status is None:
+                st.error(problem)
+            elif status.get("ready"):
+                st.session_state.session_id = data["session_id"]
+                st.success(f"File uploaded! Session ID: {st.session_state.session_id}")
+            else:
+                st.error(f"Processing failed: {status.get('error') or 'unknown error'}")
         else:
             st.error("Upload failed. Please try again.")
 
@@ -37,14 +133,21 @@ if st.session_state.session_id:
             "query": user_query,
             "session_id": st.session_state.session_id
         }
-        chat_response = requests.post(f"{FASTAPI_URL}/chat", json=payload)
-
-        if chat_response.status_code == 200:
-            responses = chat_response.json()["responses"]
-
-            for r in responses:
-                st.markdown(f"**Step: {r['step']}**")
-                st.write(r['content'])
-                st.divider()
-        else:
+        try:
+            # Steps arrive one NDJSON line at a time and are shown as they come.
+            with http.post(f"{FASTAPI_URL}/chat/stream", json=payload, stream=True, timeout=CHAT_TIMEOUT) as chat_response:
+                if chat_response.status_code == 200:
+                    for line in chat_response.iter_lines():
+                        if not line:
+                            continue
+                        r = json.loads(line)
+                        if "error" in r:
+                            st.error(f"Failed to fetch response: {r['error']}")
+                            break
+                        st.markdown(f"**Step: {r['step']}**")
+                        st.write(r['content'])
+                        st.divider()
+                else:
+                    st.error("Failed to fetch response. Try again.")
+        except requests.RequestException:
             st.error("Failed to fetch response. Try again.")
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ["QDRANT_URL"] = ":memory:"
+os.environ["SESSION_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "sessions.sqlite3")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+from groq import BadRequestError
+
+import new
+
+
+class FakeCompletions:
+    def __init__(self, replies):
+        self.replies = list(replies)
+
+    def create(self, **kwargs):
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        message = type("Message", (), {"content": reply})
+        choice = type("Choice", (), {"message": message})
+        return type("Completion", (), {"choices": [choice]})
+
+
+class FakeClient:
+    def __init__(self, replies):
+        self.chat = type("Chat", (), {"completions": FakeCompletions(replies)})
+
+
+class NoContext:
+    def similarity_search(self, query, k=4):
+        return []
+
+
+def json_validate_failed():
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    body = {"error": {"message": "Failed to generate JSON.", "type": "invalid_request_error", "code": "json_validate_failed"}}
+    return BadRequestError("json_validate_failed", response=httpx.Response(400, request=request), body=body)
+
+
+@pytest.fixture
+def assistant(monkeypatch):
+    def make(replies):
+        monkeypatch.setattr(new, "client", FakeClient(replies))
+        return new.BloodworkAssistant(NoContext())
+
+    return make
+
+
+def test_rejected_json_generation_falls_back_to_iterative(assistant):
+    output = {"step": "output", "content": "Your LDL is high."}
+    steps = assistant([json_validate_failed(), json.dumps(output)]).chat("Is my LDL high?")
+    assert steps == [output]
+
+
+def test_single_pass_reply_is_used_when_valid(assistant):
+    steps = [{"step": "analyse", "content": "LDL is 160."}, {"step": "output", "content": "Your LDL is high."}]
+    assert assistant([json.dumps({"steps": steps})]).chat("Is my LDL high?") == steps
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lab_values import _parse_line
+
+
+def test_flag_before_unit_keeps_the_unit():
+    lab_value = _parse_line("LDL 160 H mg/dL 0-100")
+    assert (lab_value.analyte, lab_value.value, lab_value.unit) == ("ldl", 160.0, "mg/dL")
+    assert lab_value.flag == "high"
+    assert (lab_value.ref_low, lab_value.ref_high) == (0.0, 100.0)
+
+
+def test_flag_after_unit_still_parses():
+    lab_value = _parse_line("HDL 35 mg/dL L")
+    assert (lab_value.unit, lab_value.flag) == ("mg/dL", "low")
+
+
+def test_name_with_digits_and_parentheses():
+    lab_value = _parse_line("Vitamin D (25-OH) 18 ng/mL 30-100")
+    assert lab_value.analyte == "vitamin_d"
+    assert lab_value.name == "Vitamin D (25-OH)"
+    assert (lab_value.value, lab_value.unit, lab_value.flag) == (18.0, "ng/mL", "low")
+
+
+def test_qualifier_after_name():
+    lab_value = _parse_line("Glucose Fasting 95 mg/dL 70-100")
+    assert (lab_value.analyte, lab_value.value, lab_value.flag) == ("glucose_fasting", 95.0, "normal")
+
+
+def test_prose_mentioning_an_analyte_is_not_a_result():
+    assert _parse_line("Glucose levels above 126 mg/dL indicate diabetes") is None
@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from session_store import SessionStore, UploadBeingDeleted
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(path=str(tmp_path / "sessions.sqlite3"), stale_after_seconds=60)
+
+
+def age(store, upload_hash, seconds):
+    store._execute("UPDATE uploads SET updated_at = updated_at - ? WHERE upload_hash = ?", (seconds, upload_hash))
+
+
+def test_heartbeat_keeps_a_queued_ingestion_from_going_stale(store):
+    _, ingestion_id = store.create("s1", "c", "h")
+    age(store, "h", 120)
+    store.heartbeat([("h", ingestion_id)])
+    assert store.fail_stale_ingestions() == 0
+    assert store.count_processing() == 1
+    _, second = store.create("s2", "c", "h")
+    assert second is None
+
+
+def test_stale_ingestion_is_replaced_and_can_no_longer_write(store):
+    _, first = store.create("s1", "c", "h")
+    age(store, "h", 120)
+    _, second = store.create("s2", "c", "h")
+    assert second not in (None, first)
+    assert not store.update_progress("h", first, pages_parsed=3)
+    assert not store.mark_ready("h", first)
+    assert not store.save_lab_table("h", first, {})
+    assert store.mark_ready("h", second)
+    assert store.get("s2").ready
+
+
+def test_purge_of_an_old_ingestion_leaves_a_re_upload_alone(store):
+    _, first = store.create("s1", "c", "h")
+    assert store.delete(["s1"]) == [("h", first)]
+    assert store.deleting() == [("h", first)]
+    assert not store.mark_ready("h", first)
+    with pytest.raises(UploadBeingDeleted):
+        store.create("s2", "c", "h")
+
+    store.purge([("h", first)])
+    _, second = store.create("s3", "c", "h")
+    # A second sweeper still holding the old pair purges nothing.
+    store.purge([("h", first)])
+    assert store.get("s3").state == "processing"
+    assert store.update_progress("h", second, chunks_embedded=1)
@@ -1,15 +1,19 @@
 from langchain_community.document_loaders import WebBaseLoader
-from langchain_community.document_loaders.sitemap import SitemapLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 # from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_qdrant import QdrantVectorStore
 # from openai import OpenAI
 from groq import Groq
 from dotenv import load_dotenv
 import os
+import sys
 import json
 
+# embedding_cache lives at the repo root and is shared with the other bots.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_cache import cached_huggingface_embeddings
+from docs_sync import COLLECTION_NAME, QDRANT_URL, refresh_docs
+
 # Load environment variables
 load_dotenv()
 
@@ -148,36 +152,19 @@ messages = [
 
 # 🚀 SETUP QDRANT DATABASE FUNCTIONS
 
-def setup_qudrant_db(split_docs, embedder):
-    print("🛠 Setting up Qdrant collection and uploading documents...")
-    vector_store = QdrantVectorStore.from_documents(
-        documents=split_docs,
-        url="http://localhost:6333",
-        collection_name="chaicode_docs",  # ⚡ Updated name here
-        embedding=embedder
-    )
-    print("✅ Successfully uploaded documents to Qdrant!")
-
 def setup_retriever_db(embedder):
     print("🔎 Setting up retriever from existing collection...")
     retriever = QdrantVectorStore.from_existing_collection(
-        url="http://localhost:6333",
-        collection_name="chaicode_docs",  # ⚡ Same name here
+        url=QDRANT_URL,
+        collection_name=COLLECTION_NAME,
         embedding=embedder
     )
     return retriever
 
-# 📄 LOAD AND SPLIT DOCUMENTS
-
-def sitemap_loader(path):
-    print("🌐 Loading documents from sitemap...")
-    sitemap_loader = SitemapLoader(web_path=path, is_local=True)
-    docs = sitemap_loader.load()
-    print(f"📄 Loaded {len(docs)} documents from sitemap.")
-    return docs
+# 📄 SPLIT DOCUMENTS
 
 def split_text(docs):
-    print("✂️ Splitting text into chunks...")
+    # Called once per page by the refresh pipeline, whose split stage reports the totals.
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200
@@ -206,9 +193,7 @@ def split_text(docs):
         elif isinstance(doc, dict):
             doc["page_content"] += f"\n\n[{title}]({source})"
 
-    texts = text_splitter.split_documents(docs)
-    print(f"✅ Finished splitting into {len(texts)} chunks.")
-    return texts
+    return text_splitter.split_documents(docs)
 
 # 🧠 CONTEXT RETRIEVAL FUNCTION
 
@@ -350,24 +335,20 @@ class ChaiBotAssistant:
 
 def setup_and_run():
     # Step 1: Embedder
-    embedder = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    # Step 2: Load docs
-    # docs = sitemap_loader("sitemap_final.xml")  
-
-    # Step 3: Split docs
-    # split_docs = split_text(docs)
+    embedder = cached_huggingface_embeddings("sentence-transformers/all-MiniLM-L6-v2")
 
-    # Step 4: Upload to Qdrant
-    # setup_qudrant_db(split_docs, embedder)
+    # Step 2: Refresh the docs collection (`python YT_webPage_Bot.py --refresh`).
+    # Only pages that changed since the last refresh are fetched and re-embedded.
+    if "--refresh" in sys.argv:
+        refresh_docs("sitemap_final.xml", embedder, split_text)
 
-    # Step 5: Initialize bot
+    # Step 3: Initialize bot
     chatbot = ChaiBotAssistant()
 
-    # # Step 6: Setup retriever
+    # # Step 4: Setup retriever
     chatbot.retriever = setup_retriever_db(embedder)
 
-    # # Step 7: Run chatbot
+    # # Step 5: Run chatbot
     chatbot.run()
 
 # 🧠 RUN THE WHOLE THING
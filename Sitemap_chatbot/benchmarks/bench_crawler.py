@@ -0,0 +1,173 @@
+"""Benchmark for temp_sitemap.crawl against a local test HTTP server.
+
+Serves a synthetic docs site (every page links to a handful of others, plus
+navigation) with a fixed per-request latency and an optional robots.txt
+crawl-delay, crawls it with the asyncio crawler, and optionally with the
+old one-page-at-a-time loop (requests.get + sleep) for comparison. Reports
+pages/s, wall time and the server's observed peak requests/s.
+
+    python benchmarks/bench_crawler.py --pages 300 --latency-ms 50 --rate 50 --baseline --output run.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from bs4 import BeautifulSoup
+
+from temp_sitemap import crawl
+
+
+class SyntheticSite:
+    def __init__(self, pages, links_per_page, latency_s, crawl_delay, seed):
+        rng = random.Random(seed)
+        self.pages = pages
+        self.latency_s = latency_s
+        self.crawl_delay = crawl_delay
+        self.links = {i: rng.sample(range(pages), min(links_per_page, pages)) for i in range(pages)}
+        self.hits_per_second = Counter()
+        self.lock = threading.Lock()
+
+    def page_html(self, i):
+        nav = "".join(f'<li><a href="/docs/page-{j}">Page {j}</a></li>' for j in range(min(10, self.pages)))
+        body = "".join(f'<p>See <a href="/docs/page-{j}">page {j}</a> for details.</p>' for j in self.links[i])
+        return f"<html><body><nav><ul>{nav}</ul></nav><h1>Page {i}</h1>{body}<p>{'lorem ipsum ' * 200}</p></body></html>"
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type="text/html"):
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                with site.lock:
+                    site.hits_per_second[int(time.monotonic())] += 1
+                if self.path == "/robots.txt":
+                    rules = f"User-agent: *\nCrawl-delay: {site.crawl_delay}\n" if site.crawl_delay else ""
+                    self._send(200 if rules else 404, rules, "text/plain")
+                    return
+                time.sleep(site.latency_s)
+                name = self.path.rstrip("/").rsplit("/", 1)[-1]
+                if not name.startswith("page-") or not name[5:].isdigit() or int(name[5:]) >= site.pages:
+                    self._send(404, "not found")
+                    return
+                self._send(200, site.page_html(int(name[5:])))
+
+        return Handler
+
+
+def serial_crawl(base_url, max_pages, sleep_s):
+    """The previous generate_sitemap loop: one requests.get at a time, then a fixed sleep."""
+    visited = set()
+    to_visit = {base_url}
+    host = urlparse(base_url).netloc
+    while to_visit and len(visited) < max_pages:
+        url = to_visit.pop()
+        if url in visited:
+            continue
+        try:
+            response = requests.get(url, timeout=5)
+            if response.status_code != 200:
+                continue
+            visited.add(url)
+            soup = BeautifulSoup(response.text, "html.parser")
+            for link in soup.find_all("a", href=True):
+                new_url = urljoin(url, link["href"])
+                if urlparse(new_url).netloc == host and new_url not in visited:
+                    to_visit.add(new_url)
+        except requests.RequestException:
+            pass
+        time.sleep(sleep_s)
+    return visited
+
+
+def _run(name, fn, site):
+    site.hits_per_second.clear()
+    start = time.perf_counter()
+    # The crawler prints every page; keep the benchmark output readable.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        pages = fn()
+    wall = time.perf_counter() - start
+    stats = {
+        "crawler": name,
+        "pages": len(pages),
+        "wall_s": round(wall, 3),
+        "pages_per_s": round(len(pages) / wall, 1) if wall else None,
+        "server_peak_rps": max(site.hits_per_second.values(), default=0),
+    }
+    print(f"  {name:<8} {stats['pages']:>6} pages  {wall:8.2f}s  {stats['pages_per_s']:>8} pages/s  server peak {stats['server_peak_rps']} req/s")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200, help="pages in the synthetic site (and pages to crawl)")
+    parser.add_argument("--links", type=int, default=8, help="in-content links per page")
+    parser.add_argument("--latency-ms", type=int, default=50, help="server latency per page")
+    parser.add_argument("--crawl-delay", type=float, default=0, help="robots.txt crawl-delay, 0 for none")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=50.0, help="crawler requests/s per host")
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--baseline", action="store_true", help="also run the old serial crawler")
+    parser.add_argument("--baseline-sleep", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    site = SyntheticSite(args.pages, args.links, args.latency_ms / 1000, args.crawl_delay, args.seed)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), site.handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/docs/page-0"
+    print(f"synthetic site: {args.pages} pages, {args.latency_ms} ms latency at {base_url}")
+
+    results = []
+    try:
+        results.append(_run("asyncio", lambda: asyncio.run(crawl(
+            base_url, max_pages=args.pages, concurrency=args.concurrency, requests_per_second=args.rate,
+            burst=args.concurrency, parse_workers=args.parse_workers,
+        )), site))
+        if args.baseline:
+            results.append(_run("serial", lambda: serial_crawl(base_url, args.pages, args.baseline_sleep), site))
+    finally:
+        server.shutdown()
+
+    output = {
+        "benchmark": "crawler",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Benchmark for docs_sync.refresh_docs against a local synthetic docs site.
+
+Builds a sitemap for a synthetic site served from a local HTTP server and
+ingests it into an in-memory Qdrant with a fake embedder that costs a fixed
+time per chunk. Compares the streaming pipeline with the previous flow (load
+every page, then split everything, then one from_documents call) on wall
+time, peak Python heap and chunks embedded. Each flow runs twice: once timed,
+once under tracemalloc for the heap. Every page carries the same footer and
+some pages repeat another page under their own URL, so the pipeline's
+duplicate-chunk elimination has something to skip. With --store discard (the
+default) vectors are dropped instead of stored, so the in-memory Qdrant,
+which holds everything in both flows, does not hide the difference in
+working set.
+
+With the defaults (20 KB pages, 2 ms/chunk) the pipeline is faster at every
+size tried (10-100 pages). Its heap is the same as load-all's at about 10
+pages and lower from about 30 pages on. Below that, the dedup index and the
+word-hash cache are a fixed few MB that the whole site's text does not yet
+outweigh.
+
+    python benchmarks/bench_ingest.py --pages 300 --page-kb 20 --embed-ms 2 --output run.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import ThreadingHTTPServer
+
+os.environ["QDRANT_URL"] = ":memory:"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import QdrantVectorStore
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import chunk_dedup
+import docs_sync
+from bench_crawler import SyntheticSite
+from docs_sync import DocsManifest, StageMeter, fetch_stage, page_text, read_sitemap, refresh_docs
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic vectors that cost embed_s per text, standing in for the MiniLM model."""
+
+    def __init__(self, embed_s, size=384):
+        self.embed_s = embed_s
+        self.size = size
+
+    def embed_documents(self, texts):
+        time.sleep(self.embed_s * len(texts))
+        return [[((hash(text) >> i) & 0xFF) / 255 for i in range(self.size)] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class LargePageSite(SyntheticSite):
+    def __init__(self, pages, links_per_page, latency_s, page_kb, footer_kb, alias_pages, seed):
+        super().__init__(pages, links_per_page, latency_s, 0, seed)
+        rng = random.Random(seed)
+        self.page_kb = page_kb
+        self.footer = " ".join(f"footer{j}" for j in range(footer_kb * 1024 // 10))
+        # Pages that serve another page's text with one changed line, like docs mirrored under two paths.
+        self.alias_of = {i: rng.randrange(pages) for i in rng.sample(range(pages), int(pages * alias_pages))}
+
+    def page_html(self, i):
+        source = self.alias_of.get(i, i)
+        words = " ".join(f"page{source}word{j}" for j in range(self.page_kb * 1024 // 12))
+        return (
+            f"<html><body><h1>Page {source}</h1><p>Served as page {i}.</p>\n\n<p>{words}</p>"
+            f"\n\n<footer>{self.footer}</footer></body></html>"
+        )
+
+
+def split_docs(docs):
+    return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(docs)
+
+
+def load_everything(sitemap_path, embedder, concurrency, rate, store):
+    """The previous flow: every page in memory, then every chunk, then one upload."""
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = DocsManifest(os.path.join(tmp, "manifest.json"))
+    pages = read_sitemap(sitemap_path)
+    responses = []
+    fetch_stage(list(pages), manifest, StageMeter("fetch", "pages"), responses.append, concurrency, rate)
+    docs = [
+        Document(page_content=page_text(response.text), metadata={"source": url})
+        for url, response in responses if response is not None and response.status_code == 200
+    ]
+    chunks = split_docs(docs)
+    if store == "memory":
+        QdrantVectorStore.from_documents(chunks, embedding=embedder, location=":memory:", collection_name="baseline")
+    else:
+        embedder.embed_documents([chunk.page_content for chunk in chunks])
+    return {"chunks_embedded": len(chunks)}
+
+
+def _run_quietly(fn):
+    # Each run starts without the word hashes an earlier one cached.
+    chunk_dedup._word_hashes.clear()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return fn()
+
+
+def _measure(name, fn):
+    # Timed with tracemalloc off, since it slows the Python-heavy stages
+    # (split, dedup) several fold. The heap peak comes from a second, traced
+    # run, which also leaves out modules the first run imported lazily.
+    start = time.perf_counter()
+    counts = _run_quietly(fn)
+    wall = time.perf_counter() - start
+    tracemalloc.start()
+    _run_quietly(fn)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    skipped = counts.get("exact_duplicate_chunks", 0) + counts.get("near_duplicate_chunks", 0)
+    stats = {
+        "flow": name,
+        "chunks_embedded": counts["chunks_embedded"],
+        "duplicate_chunks_skipped": skipped,
+        "wall_s": round(wall, 3),
+        "peak_heap_mb": round(peak / 2**20, 1),
+    }
+    print(
+        f"  {name:<10} {stats['chunks_embedded']:>7} chunks embedded  {skipped:>6} duplicates skipped  "
+        f"{wall:8.2f}s  peak heap {stats['peak_heap_mb']:>7} MB"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--page-kb", type=int, default=20, help="text per page")
+    parser.add_argument("--footer-kb", type=int, default=2, help="footer text shared by every page")
+    parser.add_argument("--alias-pages", type=float, default=0.1, help="fraction of pages that repeat another page")
+    parser.add_argument("--latency-ms", type=int, default=30, help="server latency per page")
+    parser.add_argument("--embed-ms", type=float, default=2.0, help="fake embedding cost per chunk")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=100.0, help="requests/s")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--store", choices=("discard", "memory"), default="discard",
+                        help="drop vectors after embedding, or keep them in an in-memory Qdrant")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    site = LargePageSite(args.pages, 4, args.latency_ms / 1000, args.page_kb, args.footer_kb, args.alias_pages, 0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), site.handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    embedder = FakeEmbeddings(args.embed_ms / 1000)
+    if args.store == "discard":
+        docs_sync.upsert_batch = lambda qdrant, batch, vectors: None
+        docs_sync.set_alias_sources = lambda qdrant, manifest, dedup, chunk_ids: None
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        sitemap_path = os.path.join(tmp, "sitemap.xml")
+        with open(sitemap_path, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            for i in range(args.pages):
+                f.write(f"  <url><loc>{base_url}/docs/page-{i}/</loc></url>\n")
+            f.write("</urlset>")
+        print(f"synthetic site: {args.pages} pages of {args.page_kb} KB, {args.embed_ms} ms/chunk embedding, store={args.store}")
+
+        try:
+            results.append(_measure("pipeline", lambda: refresh_docs(
+                sitemap_path, embedder, split_docs, manifest_path=os.path.join(tmp, "manifest.json"),
+                concurrency=args.concurrency, requests_per_second=args.rate,
+                batch_size=args.batch_size, queue_size=args.queue_size,
+            )))
+            results.append(_measure("load-all", lambda: load_everything(sitemap_path, embedder, args.concurrency, args.rate, args.store)))
+        finally:
+            server.shutdown()
+
+    output = {
+        "benchmark": "docs_ingest",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
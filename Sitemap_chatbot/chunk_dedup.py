@@ -0,0 +1,164 @@
+"""Exact and near-duplicate detection for docs chunks, before they are embedded.
+
+Chunks are compared by a hash of their normalized text (exact copies) and by
+MinHash signatures over word 3-grams, bucketed with LSH so each new chunk is
+only compared with likely matches (navigation, footers, pages served under
+alias URLs).
+"""
+import base64
+import hashlib
+import string
+import threading
+import zlib
+from collections import defaultdict
+from typing import NamedTuple
+
+import numpy as np
+
+_PUNCTUATION = str.maketrans({c: " " for c in string.punctuation})
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SHIFT = np.uint64(32)
+_SHINGLE_MULTIPLIER = np.uint64(1_000_003)
+
+
+class _WordHashes(dict):
+    # Docs reuse a small vocabulary, so each word is hashed once per process.
+    # 20k words covers a docs site's vocabulary and costs ~3 MB; a larger
+    # cache was most of the pipeline's fixed memory on small sites.
+    def __missing__(self, word):
+        if len(self) > 20_000:
+            self.clear()
+        value = self[word] = zlib.crc32(word.encode("utf-8"))
+        return value
+
+
+_word_hashes = _WordHashes()
+
+
+def words_of(text):
+    return text.lower().translate(_PUNCTUATION).split()
+
+
+def text_hash(words):
+    return hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()[:32]
+
+
+class MinHasher:
+    """MinHash signatures over word shingles; a fixed seed keeps them comparable across runs."""
+
+    def __init__(self, num_perm=64, shingle_words=3, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        # Odd multipliers for multiply-shift hashing.
+        self.a = rng.randint(0, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.randint(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, words):
+        # Each word is hashed once (crc32 is stable across runs) and every
+        # k-word shingle hash is combined from them arithmetically.
+        word_hashes = np.fromiter(map(_word_hashes.__getitem__, words), dtype=np.uint64, count=len(words))
+        count = max(1, len(words) - self.shingle_words + 1)
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(min(self.shingle_words, len(words))):
+            shingles = shingles * _SHINGLE_MULTIPLIER + word_hashes[offset:offset + count]
+        shingles &= _MAX_HASH
+        # Multiply-shift universal hashing: the top 32 bits of a*x + b (mod 2**64), no division needed.
+        with np.errstate(over="ignore"):
+            permuted = (shingles[:, None] * self.a + self.b) >> _SHIFT
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+def encode_signature(signature):
+    return base64.b64encode(signature.tobytes()).decode("ascii")
+
+
+def decode_signature(value):
+    return np.frombuffer(base64.b64decode(value), dtype=np.uint32)
+
+
+class Match(NamedTuple):
+    chunk_id: str
+    source: str
+    text_hash: str
+    exact: bool
+
+
+class ChunkDedupIndex:
+    """The chunks kept so far, found by exact text hash or by LSH bands of their MinHash.
+
+    A candidate from the bands counts as a near duplicate when the signatures
+    agree on at least `threshold` of their positions (estimated Jaccard
+    similarity of the 3-gram sets). Safe to share between pipeline threads.
+    """
+
+    def __init__(self, hasher=None, threshold=0.8, bands=16):
+        self.hasher = hasher or MinHasher()
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self.lock = threading.Lock()
+        self.exact = {}
+        # Most buckets hold a single chunk, so lists keyed by int are far smaller than sets keyed by bytes.
+        self.buckets = defaultdict(list)
+        self.chunks = {}
+        self.by_source = defaultdict(set)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self.chunks
+
+    def holds(self, chunk_id, hashed):
+        """Whether chunk_id is still kept with the same text (ids are reused when a page changes)."""
+        kept = self.chunks.get(chunk_id)
+        return kept is not None and kept[1] == hashed
+
+    def fingerprint(self, text):
+        """(hash of the normalized text, MinHash signature)."""
+        words = words_of(text)
+        return text_hash(words), self.hasher.signature(words)
+
+    def _band_keys(self, signature):
+        return [hash((band, signature[band * self.rows:(band + 1) * self.rows].tobytes())) for band in range(self.bands)]
+
+    def _add(self, chunk_id, source, hashed, signature):
+        self.chunks[chunk_id] = (source, hashed, signature)
+        self.by_source[source].add(chunk_id)
+        self.exact.setdefault(hashed, chunk_id)
+        for key in self._band_keys(signature):
+            self.buckets[key].append(chunk_id)
+
+    def add(self, chunk_id, source, hashed, signature):
+        with self.lock:
+            self._add(chunk_id, source, hashed, signature)
+
+    def match_or_add(self, chunk_id, source, hashed, signature):
+        """The kept chunk this one duplicates, or None after keeping this one."""
+        with self.lock:
+            kept = self.exact.get(hashed)
+            if kept is not None:
+                return Match(kept, self.chunks[kept][0], hashed, True)
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self.buckets.get(key, ()))
+            best, best_similarity = None, self.threshold
+            for candidate in candidates:
+                similarity = float(np.mean(self.chunks[candidate][2] == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+            if best is not None:
+                return Match(best, self.chunks[best][0], self.chunks[best][1], False)
+            self._add(chunk_id, source, hashed, signature)
+            return None
+
+    def remove_source(self, source):
+        """Forgets the chunks kept for source (its points are about to be replaced or deleted)."""
+        with self.lock:
+            for chunk_id in self.by_source.pop(source, ()):
+                _, hashed, signature = self.chunks.pop(chunk_id)
+                if self.exact.get(hashed) == chunk_id:
+                    del self.exact[hashed]
+                for key in self._band_keys(signature):
+                    bucket = self.buckets[key]
+                    bucket.remove(chunk_id)
+                    if not bucket:
+                        del self.buckets[key]
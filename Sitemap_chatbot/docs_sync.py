@@ -0,0 +1,495 @@
+"""Incremental refresh of the chaicode_docs collection from a sitemap.
+
+A JSON manifest records, per URL, the sitemap <lastmod>, the ETag and
+Last-Modified the server sent, and a hash of the page text. A refresh skips
+URLs whose lastmod has not moved and revalidates the rest with conditional
+GETs. Only pages whose text actually changed are re-split and re-embedded.
+Points of changed and removed pages are deleted by metadata.source first.
+Changed pages stream through fetch -> extract -> split -> dedup -> embed ->
+upsert stages, so memory stays bounded however large the site is. The dedup
+stage drops exact and near-duplicate chunks before they are embedded and
+records the duplicate's URL on the chunk that was kept (alias_sources).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict
+
+import httpx
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+from langchain_qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient, models
+
+from chunk_dedup import ChunkDedupIndex, decode_signature, encode_signature
+from temp_sitemap import USER_AGENT, TokenBucket, canonicalize_url
+
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+COLLECTION_NAME = "chaicode_docs"
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "docs_manifest.json")
+EMBED_BATCH_SIZE = 64
+# Items each pipeline stage may have waiting for the next one.
+QUEUE_SIZE = 8
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+class DocsManifest:
+    """What is stored in the collection for each URL, kept in a JSON file."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def put(self, url, **fields):
+        self.entries[url] = fields
+
+    def remove(self, url):
+        self.entries.pop(url, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def read_sitemap(path):
+    """Returns {canonical loc: lastmod or None} in sitemap order; spelling variants of a URL collapse into one."""
+    pages = {}
+    for url in ET.parse(path).getroot().iter(f"{SITEMAP_NS}url"):
+        loc = url.findtext(f"{SITEMAP_NS}loc")
+        if loc:
+            lastmod = url.findtext(f"{SITEMAP_NS}lastmod")
+            pages.setdefault(canonicalize_url(loc), lastmod.strip() if lastmod else None)
+    return pages
+
+
+def page_text(html):
+    # Same text SitemapLoader used to extract, so chunks don't change just because the loader did.
+    return BeautifulSoup(html, "html.parser").get_text()
+
+
+def chunk_id(source, index):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}:{index}"))
+
+
+def sources_filter(sources):
+    return models.Filter(
+        must=[models.FieldCondition(key="metadata.source", match=models.MatchAny(any=list(sources)))]
+    )
+
+
+def ensure_collection(qdrant, embedder):
+    if qdrant.collection_exists(COLLECTION_NAME):
+        return False
+    vector_size = len(embedder.embed_query("vector size probe"))
+    qdrant.create_collection(
+        collection_name=COLLECTION_NAME,
+        vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+    )
+    qdrant.create_payload_index(
+        collection_name=COLLECTION_NAME,
+        field_name="metadata.source",
+        field_schema=models.PayloadSchemaType.KEYWORD,
+    )
+    return True
+
+
+def delete_other_sources(qdrant, sources):
+    qdrant.delete(
+        collection_name=COLLECTION_NAME,
+        points_selector=models.FilterSelector(filter=models.Filter(
+            must_not=[models.FieldCondition(key="metadata.source", match=models.MatchAny(any=list(sources)))]
+        )),
+    )
+
+
+def delete_sources(qdrant, sources):
+    if sources:
+        qdrant.delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=models.FilterSelector(filter=sources_filter(sources)),
+        )
+
+
+class StageMeter:
+    """Items a pipeline stage produced and the time it spent working (not waiting on its neighbours)."""
+
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.busy = 0.0
+
+    def timed(self):
+        return _Timed(self)
+
+    def report(self, wall):
+        rate = f"{self.items / self.busy:8.1f} {self.unit}/s busy" if self.busy else ""
+        return f"   {self.name:<8} {self.items:>6} {self.unit:<7} {self.busy:7.2f}s busy  {rate}  ({self.items / wall:.1f} {self.unit}/s overall)"
+
+
+class _Timed:
+    def __init__(self, meter):
+        self.meter = meter
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.meter.busy += time.perf_counter() - self.start
+
+
+class _StageFailed:
+    def __init__(self, error):
+        self.error = error
+
+
+_STAGE_DONE = object()
+
+
+def run_stage(produce, maxsize):
+    """Runs produce(put) in its own thread and yields what it puts.
+
+    put blocks while maxsize items are waiting, so a fast stage cannot run
+    ahead of a slow one and memory stays bounded. An exception in the stage
+    is re-raised in the consumer.
+    """
+    handoff = queue.Queue(maxsize)
+
+    def run():
+        try:
+            produce(handoff.put)
+        except BaseException as e:
+            handoff.put(_StageFailed(e))
+        finally:
+            handoff.put(_STAGE_DONE)
+
+    threading.Thread(target=run, daemon=True).start()
+    while True:
+        item = handoff.get()
+        if item is _STAGE_DONE:
+            return
+        if isinstance(item, _StageFailed):
+            raise item.error
+        yield item
+
+
+def fetch_stage(urls, manifest, meter, put, concurrency=8, requests_per_second=10.0, force=False):
+    """Conditional GETs for urls (plain GETs with force); puts (url, response or None on network error) as each one completes."""
+
+    async def fetch_all():
+        bucket = TokenBucket(requests_per_second, concurrency)
+        remaining = iter(urls)
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(
+            timeout=10, limits=limits, follow_redirects=True, headers={"User-Agent": USER_AGENT}
+        ) as client:
+
+            async def worker():
+                for url in remaining:
+                    entry = {} if force else manifest.get(url) or {}
+                    headers = {}
+                    if entry.get("etag"):
+                        headers["If-None-Match"] = entry["etag"]
+                    if entry.get("last_modified"):
+                        headers["If-Modified-Since"] = entry["last_modified"]
+                    await bucket.acquire()
+                    start = time.perf_counter()
+                    try:
+                        response = await client.get(url, headers=headers)
+                    except httpx.HTTPError as e:
+                        print(f"❌ Error fetching {url}: {str(e)}")
+                        response = None
+                    # Summed over concurrent requests, so it can exceed wall time.
+                    meter.busy += time.perf_counter() - start
+                    meter.items += 1
+                    # Waits in a thread when the next stage is behind, without blocking the other fetches.
+                    await asyncio.to_thread(put, (url, response))
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    asyncio.run(fetch_all())
+
+
+def extract_stage(responses, sitemap, manifest, qdrant, new_collection, dedup, force, stats, changed, meter, put):
+    """Sorts responses into unchanged, removed and changed; puts a Document for each changed page.
+
+    With force, every page that answers 200 counts as changed.
+    """
+    for url, response in responses:
+        doc = None
+        with meter.timed():
+            entry = manifest.get(url)
+            if response is None:
+                stats["failed"] += 1
+            elif response.status_code == 304 and entry:
+                entry["lastmod"] = sitemap[url]
+                stats["not_modified"] += 1
+            elif response.status_code in (404, 410):
+                dedup.remove_source(url)
+                delete_sources(qdrant, [url])
+                changed[url] = None
+                stats["removed"] += 1
+            elif response.status_code != 200:
+                print(f"⚠️ {url} answered {response.status_code}; keeping what is stored.")
+                stats["failed"] += 1
+            else:
+                text = page_text(response.text)
+                fields = {
+                    "lastmod": sitemap[url],
+                    "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified"),
+                    "content_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                }
+                if entry and entry.get("content_hash") == fields["content_hash"] and not force:
+                    entry.update(fields)
+                    stats["same_content"] += 1
+                else:
+                    stats["changed" if entry else "new"] += 1
+                    # Also clears points stored before the manifest existed (random ids, same
+                    # source), and those of an earlier pass of this run.
+                    if entry or not new_collection or url in changed:
+                        delete_sources(qdrant, [url])
+                    dedup.remove_source(url)
+                    changed[url] = fields
+                    doc = Document(page_content=text, metadata={"source": url, "loc": url, "lastmod": sitemap[url]})
+                    meter.items += 1
+        if doc is not None:
+            put(doc)
+
+
+def split_stage(docs, split_docs, chunk_counts, meter, put):
+    for doc in docs:
+        with meter.timed():
+            chunks = split_docs([doc])
+            for chunk in chunks:
+                source = chunk.metadata["source"]
+                chunk.metadata["_id"] = chunk_id(source, chunk_counts[source])
+                chunk_counts[source] += 1
+            meter.items += len(chunks)
+        for chunk in chunks:
+            put(chunk)
+
+
+def dedup_stage(chunks, dedup, kept, duplicates, stats, meter, put):
+    """Puts only chunks that are not exact or near copies of a chunk already kept."""
+    for chunk in chunks:
+        with meter.timed():
+            source = chunk.metadata["source"]
+            hashed, signature = dedup.fingerprint(chunk.page_content)
+            match = dedup.match_or_add(chunk.metadata["_id"], source, hashed, signature)
+            if match is None:
+                kept[source][chunk.metadata["_id"]] = [hashed, encode_signature(signature)]
+            else:
+                duplicates[source][match.chunk_id] = [match.source, match.text_hash]
+                stats["exact_duplicate_chunks" if match.exact else "near_duplicate_chunks"] += 1
+                stats["duplicate_chars"] += len(chunk.page_content)
+            meter.items += 1
+        if match is None:
+            put(chunk)
+
+
+def set_alias_sources(qdrant, manifest, dedup, chunk_ids):
+    """Records on each kept chunk the other pages whose copies of it were dropped."""
+    aliases = defaultdict(set)
+    for url, entry in manifest.entries.items():
+        for kept_id, (owner, _) in entry.get("duplicates", {}).items():
+            if owner != url:
+                aliases[kept_id].add(url)
+    groups = defaultdict(list)
+    for kept_id in chunk_ids:
+        if kept_id in dedup:
+            groups[tuple(sorted(aliases.get(kept_id, ())))].append(kept_id)
+    for sources, ids in groups.items():
+        qdrant.set_payload(
+            collection_name=COLLECTION_NAME, payload={"alias_sources": list(sources)}, points=ids,
+            key=QdrantVectorStore.METADATA_KEY,
+        )
+
+
+def embed_stage(chunks, embedder, batch_size, meter, put):
+    def embed(batch):
+        with meter.timed():
+            vectors = embedder.embed_documents([chunk.page_content for chunk in batch])
+        meter.items += len(batch)
+        put((batch, vectors))
+
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            embed(batch)
+            batch = []
+    if batch:
+        embed(batch)
+
+
+def upsert_batch(qdrant, batch, vectors):
+    points = []
+    for chunk, vector in zip(batch, vectors):
+        metadata = dict(chunk.metadata)
+        point_id = metadata.pop("_id")
+        # Same payload layout QdrantVectorStore writes and reads.
+        payload = {QdrantVectorStore.CONTENT_KEY: chunk.page_content, QdrantVectorStore.METADATA_KEY: metadata}
+        points.append(models.PointStruct(id=point_id, vector=vector, payload=payload))
+    qdrant.upsert(collection_name=COLLECTION_NAME, points=points)
+
+
+def refresh_docs(sitemap_path, embedder, split_docs, manifest_path=MANIFEST_PATH, revalidate_all=False,
+                 concurrency=8, requests_per_second=10.0, batch_size=EMBED_BATCH_SIZE, queue_size=QUEUE_SIZE,
+                 dedup_threshold=0.8):
+    """Brings chaicode_docs in line with the sitemap and returns what happened per URL, as counts.
+
+    split_docs turns a list of changed pages (Documents) into chunks. With
+    revalidate_all, pages whose lastmod is unchanged are still checked with a
+    conditional GET. Chunks whose estimated similarity to a kept chunk is at
+    least dedup_threshold are not embedded.
+
+    Fetch, extract, split, dedup, embed and upsert run as overlapping stages,
+    each in its own thread, joined by queues of at most queue_size items.
+    Chunks reach Qdrant while later pages are still downloading, and memory
+    does not grow with the size of the site.
+    """
+    start = time.perf_counter()
+    sitemap = read_sitemap(sitemap_path)
+    manifest = DocsManifest(manifest_path)
+    qdrant = QdrantClient(location=QDRANT_URL)
+    new_collection = ensure_collection(qdrant, embedder)
+    if new_collection:
+        # A new collection holds nothing the manifest describes.
+        manifest.entries = {}
+    elif not manifest.entries:
+        # First refresh of an existing collection: drop points under URLs the sitemap no
+        # longer has in canonical form (e.g. the slash variants of older uploads).
+        delete_other_sources(qdrant, sitemap)
+    stats = Counter()
+
+    dedup = ChunkDedupIndex(threshold=dedup_threshold)
+    for url, entry in manifest.entries.items():
+        for kept_id, (hashed, signature) in entry.get("signatures", {}).items():
+            dedup.add(kept_id, url, hashed, decode_signature(signature))
+
+    to_check = []
+    for url, lastmod in sitemap.items():
+        entry = manifest.get(url)
+        if entry and lastmod and entry.get("lastmod") == lastmod and not revalidate_all:
+            stats["unchanged"] += 1
+        else:
+            to_check.append(url)
+    removed = [url for url in manifest.entries if url not in sitemap]
+    for url in removed:
+        dedup.remove_source(url)
+    delete_sources(qdrant, removed)
+    stats["removed"] = len(removed)
+    print(f"🔄 Revalidating {len(to_check)} of {len(sitemap)} pages...")
+
+    # url -> manifest fields for re-embedded pages, or None for pages that are gone.
+    changed = {}
+    chunk_counts = Counter()
+    # Per re-embedded page: chunks kept (id -> [text hash, signature]) and
+    # chunks dropped (id of the kept copy -> [the page that holds it, its text hash]).
+    kept = defaultdict(dict)
+    duplicates = defaultdict(dict)
+    meters = [
+        StageMeter("fetch", "pages"), StageMeter("extract", "pages"), StageMeter("split", "chunks"),
+        StageMeter("dedup", "chunks"), StageMeter("embed", "chunks"), StageMeter("upsert", "chunks"),
+    ]
+    fetch_meter, extract_meter, split_meter, dedup_meter, embed_meter, upsert_meter = meters
+
+    def run_pipeline(urls, force):
+        responses = run_stage(
+            lambda put: fetch_stage(urls, manifest, fetch_meter, put, concurrency, requests_per_second, force),
+            queue_size,
+        )
+        docs = run_stage(
+            lambda put: extract_stage(
+                responses, sitemap, manifest, qdrant, new_collection, dedup, force, stats, changed, extract_meter, put
+            ),
+            queue_size,
+        )
+        chunks = run_stage(lambda put: split_stage(docs, split_docs, chunk_counts, split_meter, put), queue_size * batch_size)
+        unique = run_stage(
+            lambda put: dedup_stage(chunks, dedup, kept, duplicates, stats, dedup_meter, put), queue_size * batch_size
+        )
+        batches = run_stage(lambda put: embed_stage(unique, embedder, batch_size, embed_meter, put), queue_size)
+        for batch, vectors in batches:
+            with upsert_meter.timed():
+                upsert_batch(qdrant, batch, vectors)
+            upsert_meter.items += len(batch)
+            print(f"🧠 Stored {upsert_meter.items} chunks")
+
+    def lost_kept_copy(page_duplicates):
+        return any(not dedup.holds(kept_id, hashed) for kept_id, (_, hashed) in page_duplicates.items())
+
+    urls, forced = to_check, set()
+    while urls:
+        run_pipeline(urls, force=bool(forced))
+        # Pages whose dropped chunks point at a copy that is now gone: pages not
+        # re-embedded this run, by their manifest entry, and pages re-embedded
+        # this run, whose chunks may have matched another changed page's old
+        # copy before that page was re-extracted without it.
+        urls = [
+            url for url in sitemap
+            if url not in forced and (
+                lost_kept_copy(duplicates[url]) if changed.get(url)
+                else url not in changed and lost_kept_copy((manifest.get(url) or {}).get("duplicates", {}))
+            )
+        ]
+        if urls:
+            print(f"🔁 Re-embedding {len(urls)} pages whose duplicate chunks lost the copy that was kept...")
+        for url in urls:
+            kept.pop(url, None)
+            duplicates.pop(url, None)
+            chunk_counts.pop(url, None)
+        forced.update(urls)
+    stats["chunks_embedded"] = upsert_meter.items
+
+    touched = set()
+    for url in [*changed, *removed]:
+        touched.update((manifest.get(url) or {}).get("duplicates", {}))
+    for url, fields in changed.items():
+        if fields is None:
+            manifest.remove(url)
+        else:
+            manifest.put(
+                url, **fields, chunks=len(kept[url]), signatures=kept[url], duplicates=duplicates[url]
+            )
+            touched.update(kept[url])
+            touched.update(duplicates[url])
+    for url in removed:
+        manifest.remove(url)
+    set_alias_sources(qdrant, manifest, dedup, touched)
+    manifest.save()
+
+    wall = time.perf_counter() - start
+    duplicate_chunks = stats["exact_duplicate_chunks"] + stats["near_duplicate_chunks"]
+    summary = ", ".join(f"{key} {value}" for key, value in sorted(stats.items()))
+    print(f"✅ Docs refreshed in {wall:.1f}s: {summary}")
+    if duplicate_chunks:
+        seconds_per_chunk = embed_meter.busy / embed_meter.items if embed_meter.items else 0.0
+        vector_size = qdrant.get_collection(COLLECTION_NAME).config.params.vectors.size
+        print(
+            f"♻️ Dedup skipped {duplicate_chunks} of {dedup_meter.items} chunks "
+            f"({stats['exact_duplicate_chunks']} exact, {stats['near_duplicate_chunks']} near): "
+            f"{stats['duplicate_chars'] / 2**20:.2f} MB of text and {duplicate_chunks * vector_size * 4 / 2**20:.2f} MB "
+            f"of vectors not stored, ~{duplicate_chunks * seconds_per_chunk:.1f}s of embedding saved "
+            f"(dedup itself took {dedup_meter.busy:.1f}s)"
+        )
+    print("📊 Stage throughput:")
+    for meter in meters:
+        print(meter.report(wall))
+    return stats
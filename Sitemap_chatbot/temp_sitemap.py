@@ -1,53 +1,327 @@
-import requests
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+import asyncio
+import json
+import os
+import re
 import time
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+from xml.sax.saxutils import escape
 
-def generate_sitemap(base_url, output_file="sitemap_final.xml", max_pages=500):
-    visited = set()
-    to_visit = set([base_url])
+import httpx
+from bs4 import BeautifulSoup
 
-    def is_valid(url):
-        parsed = urlparse(url)
-        return parsed.netloc == urlparse(base_url).netloc and parsed.scheme in ("http", "https")
+USER_AGENT = "ChaiDocsSitemapBot/1.0"
+# Ad click ids only (utm_* is matched by prefix). Parameters like "ref" select
+# real content on many doc sites (e.g. a branch), so they are never stripped.
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "dclid", "msclkid", "yclid"})
 
-    print(f"🚀 Starting sitemap generation for: {base_url}")
 
-    while to_visit and len(visited) < max_pages:
-        url = to_visit.pop()
-        if url in visited:
-            continue
-        
+class TokenBucket:
+    """Per-host rate limiter: `rate` requests per second on average, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def canonicalize_url(url):
+    """One spelling per page, so slash, fragment and tracking variants are crawled and embedded once.
+
+    Lower-cases scheme and host, drops default ports, fragments and tracking
+    parameters, sorts the query, and gives extension-less paths a trailing
+    slash (the form the docs site serves and lists in its sitemap).
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https"):
+        return url
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    if "." not in path.rsplit("/", 1)[-1] and not path.endswith("/"):
+        path += "/"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def extract_links(html, page_url):
+    # Runs in the parser pool, so it has to be a module-level function.
+    soup = BeautifulSoup(html, "html.parser")
+    links = []
+    for link in soup.find_all("a", href=True):
         try:
-            response = requests.get(url, timeout=5)
-            if response.status_code != 200:
+            links.append(canonicalize_url(urljoin(page_url, link["href"])))
+        except ValueError:
+            # e.g. an unbalanced "[" in the host; one bad href shouldn't cost the page's other links.
+            continue
+    return links
+
+
+def load_checkpoint(path, base_url):
+    """The saved crawl state for base_url, or None."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    return state if state.get("base_url") == base_url else None
+
+
+def save_checkpoint(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def parse_crawl_delay(lines, user_agent):
+    """Crawl-delay in seconds for user_agent; urllib's parser only understands whole seconds."""
+    token = user_agent.split("/")[0].lower()
+    delays = {}
+    agents = []
+    in_agent_lines = False
+    for raw in lines:
+        line = raw.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        key, value = (part.strip() for part in line.split(":", 1))
+        key = key.lower()
+        if key == "user-agent":
+            if not in_agent_lines:
+                agents = []
+            agents.append(value.lower())
+            in_agent_lines = True
+            continue
+        in_agent_lines = False
+        if key == "crawl-delay":
+            try:
+                delay = float(value)
+            except ValueError:
                 continue
+            for agent in agents:
+                delays.setdefault(agent, delay)
+    # Same matching as RobotFileParser: a named group wins over "*".
+    for agent, delay in delays.items():
+        if agent != "*" and agent in token:
+            return delay
+    return delays.get("*")
 
-            visited.add(url)
-            soup = BeautifulSoup(response.text, "html.parser")
 
-            for link in soup.find_all("a", href=True):
-                new_url = urljoin(url, link["href"])
-                if is_valid(new_url) and new_url not in visited:
-                    to_visit.add(new_url)
+def http_date_to_w3c(value):
+    """Last-Modified header -> sitemap <lastmod>, or None if missing or unparseable."""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).isoformat()
+    except (TypeError, ValueError):
+        return None
 
-            print(f"✅ Crawled: {url} ({len(visited)}/{max_pages})")
 
-        except Exception as e:
-            print(f"❌ Error visiting {url}: {str(e)}")
-        
-        time.sleep(0.5)  # Be gentle to servers!
+async def load_robots(client, base_url, user_agent):
+    """Returns (RobotFileParser, crawl delay in seconds or None)."""
+    lines = []
+    robots = RobotFileParser()
+    try:
+        response = await client.get(urljoin(base_url, "/robots.txt"))
+        # As in RobotFileParser.read: a missing robots.txt allows everything,
+        # one behind authentication (401/403) allows nothing.
+        if response.status_code == 200:
+            lines = response.text.splitlines()
+        elif response.status_code in (401, 403):
+            robots.disallow_all = True
+    except httpx.HTTPError:
+        pass
+    robots.parse(lines)
+    return robots, parse_crawl_delay(lines, user_agent)
 
-    # Write to sitemap.xml
-    print(f"📝 Writing {len(visited)} URLs to {output_file}...")
+
+async def crawl(base_url, max_pages=500, concurrency=8, requests_per_second=10.0, burst=10,
+                max_frontier=10000, parse_workers=None, user_agent=USER_AGENT,
+                checkpoint_path=None, checkpoint_interval=30.0):
+    """Crawls same-host pages from base_url; returns {url: lastmod or None} for pages that answered 200.
+
+    `concurrency` fetches run at once over one pooled client, throttled per
+    host by a token bucket (slowed further if robots.txt sets a crawl-delay).
+    Links are parsed in a process pool. The frontier holds at most
+    `max_frontier` URLs; links found while it is full are dropped.
+
+    With `checkpoint_path`, the crawl state is saved there every
+    `checkpoint_interval` seconds and when the crawl is interrupted, and a
+    later crawl of the same base_url resumes from it. The file is removed
+    once the crawl finishes.
+    """
+    base_url = canonicalize_url(base_url)
+    host = urlparse(base_url).netloc
+    visited = {}
+    seen = {base_url}
+    # Queued or in flight, in discovery order: the frontier a checkpoint has to restore.
+    pending = {base_url: None}
+    dropped = 0
+    buckets = {}
+    frontier = asyncio.Queue(maxsize=max_frontier)
+    loop = asyncio.get_running_loop()
+
+    state = load_checkpoint(checkpoint_path, base_url)
+    if state:
+        visited.update(state["visited"])
+        seen.update(state["seen"])
+        pending = dict.fromkeys(state["pending"])
+        print(f"♻️ Resuming crawl: {len(visited)} pages done, {len(pending)} queued.")
+    for url in list(pending):
+        try:
+            frontier.put_nowait(url)
+        except asyncio.QueueFull:
+            del pending[url]
+            dropped += 1
+    claimed = len(visited)
+
+    def checkpoint():
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, {
+                "base_url": base_url, "visited": visited, "seen": list(seen), "pending": list(pending),
+            })
+
+    def is_valid(url):
+        parsed = urlparse(url)
+        return parsed.netloc == host and parsed.scheme in ("http", "https")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        timeout=5, limits=limits, follow_redirects=True, headers={"User-Agent": user_agent}
+    ) as client:
+        robots, crawl_delay = await load_robots(client, base_url, user_agent)
+        rate = min(requests_per_second, 1 / crawl_delay) if crawl_delay else requests_per_second
+
+        def bucket_for(url):
+            netloc = urlparse(url).netloc
+            if netloc not in buckets:
+                buckets[netloc] = TokenBucket(rate, 1 if crawl_delay else burst)
+            return buckets[netloc]
+
+        async def fetch(url, parser_pool):
+            # Runs with a page slot claimed; the slot is given back unless the page gets recorded.
+            nonlocal claimed, dropped
+            recorded = False
+            try:
+                await bucket_for(url).acquire()
+                response = await client.get(url)
+                # A redirect can land on a page that is already crawled under its canonical URL.
+                final_url = canonicalize_url(str(response.url))
+                if response.status_code != 200 or (final_url != url and final_url in visited):
+                    return
+                seen.add(final_url)
+
+                links = []
+                if "html" in response.headers.get("content-type", "html"):
+                    links = await loop.run_in_executor(parser_pool, extract_links, response.text, final_url)
+                # Recorded together with its links, so a checkpoint never has one without the other.
+                visited[final_url] = http_date_to_w3c(response.headers.get("last-modified"))
+                recorded = True
+                print(f"✅ Crawled: {final_url} ({len(visited)}/{max_pages})")
+                for new_url in links:
+                    if is_valid(new_url) and new_url not in seen:
+                        try:
+                            frontier.put_nowait(new_url)
+                        except asyncio.QueueFull:
+                            dropped += 1
+                            continue
+                        seen.add(new_url)
+                        pending[new_url] = None
+            finally:
+                if not recorded:
+                    claimed -= 1
+
+        async def worker(parser_pool):
+            nonlocal claimed
+            while True:
+                url = await frontier.get()
+                try:
+                    # Claim a page slot before fetching, so in-flight requests can't overshoot max_pages.
+                    if url not in visited and claimed < max_pages and robots.can_fetch(user_agent, url):
+                        claimed += 1
+                        await fetch(url, parser_pool)
+                except Exception as e:
+                    # Not only httpx.HTTPError: InvalidURL, parse errors and the like
+                    # must not kill the worker, or frontier.join() never returns.
+                    print(f"❌ Error visiting {url}: {str(e)}")
+                finally:
+                    pending.pop(url, None)
+                    frontier.task_done()
+
+        async def checkpointer():
+            while True:
+                await asyncio.sleep(checkpoint_interval)
+                checkpoint()
+
+        print(f"🚀 Starting sitemap generation for: {base_url}")
+        with ProcessPoolExecutor(max_workers=parse_workers or os.cpu_count()) as parser_pool:
+            workers = [asyncio.create_task(worker(parser_pool)) for _ in range(concurrency)]
+            workers.append(asyncio.create_task(checkpointer()))
+            try:
+                await frontier.join()
+            except BaseException:
+                # Interrupted (Ctrl+C, cancellation, a crash): keep what we have for the next run.
+                checkpoint()
+                if checkpoint_path:
+                    print(f"💾 Crawl state saved to {checkpoint_path}")
+                raise
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    if dropped:
+        print(f"⚠️ Frontier was full; dropped {dropped} links.")
+    return visited
+
+
+def write_sitemap(pages, output_file):
+    """pages maps each URL to its lastmod (or None)."""
+    print(f"📝 Writing {len(pages)} URLs to {output_file}...")
     with open(output_file, "w", encoding="utf-8") as f:
         f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
         f.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
-        for url in visited:
-            f.write(f"  <url>\n    <loc>{url}</loc>\n  </url>\n")
+        for url, lastmod in pages.items():
+            lastmod_tag = f"\n    <lastmod>{lastmod}</lastmod>" if lastmod else ""
+            f.write(f"  <url>\n    <loc>{escape(url)}</loc>{lastmod_tag}\n  </url>\n")
         f.write("</urlset>")
 
+
+def generate_sitemap(base_url, output_file="sitemap_final.xml", max_pages=500, **crawl_options):
+    # Interrupted crawls resume from here on the next run.
+    crawl_options.setdefault("checkpoint_path", f"{output_file}.checkpoint.json")
+    visited = asyncio.run(crawl(base_url, max_pages=max_pages, **crawl_options))
+    write_sitemap(visited, output_file)
     print(f"🎉 Sitemap generated successfully: {output_file}")
+    return visited
+
 
-# Example usage:
-generate_sitemap("https://chaidocs.vercel.app/youtube/getting-started")
+if __name__ == "__main__":
+    # Example usage:
+    generate_sitemap("https://chaidocs.vercel.app/youtube/getting-started")
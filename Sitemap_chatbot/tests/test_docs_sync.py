@@ -0,0 +1,108 @@
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ["QDRANT_URL"] = ":memory:"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from qdrant_client import QdrantClient
+
+import docs_sync
+from docs_sync import COLLECTION_NAME, refresh_docs
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[((hash(text) >> i) & 0xFF) / 255 + 0.01 for i in range(16)] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def passage(seed):
+    words = random.Random(seed).choices([f"word{i}" for i in range(500)], k=60)
+    return " ".join(words)
+
+
+def split_paragraphs(docs):
+    # One chunk per paragraph, so a shared paragraph is an exact duplicate chunk.
+    return [
+        Document(page_content=part, metadata=dict(doc.metadata))
+        for doc in docs
+        for part in doc.page_content.split("\n\n")
+        if part.strip()
+    ]
+
+
+@pytest.fixture
+def site():
+    pages, slow = {}, set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path in slow:
+                time.sleep(0.5)
+            body = pages.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", pages, slow
+    server.shutdown()
+
+
+def write_sitemap(path, urls, lastmod):
+    entries = "".join(f"<url><loc>{url}</loc><lastmod>{lastmod}</lastmod></url>" for url in urls)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>')
+
+
+def stored_texts(qdrant):
+    points, _ = qdrant.scroll(COLLECTION_NAME, limit=1000, with_payload=True)
+    return [point.payload["page_content"] for point in points]
+
+
+def test_shared_passage_survives_when_the_page_holding_it_drops_it(site, tmp_path, monkeypatch):
+    base, pages, slow = site
+    qdrant = QdrantClient(location=":memory:")
+    monkeypatch.setattr(docs_sync, "QdrantClient", lambda location: qdrant)
+    sitemap_path, manifest_path = str(tmp_path / "sitemap.xml"), str(tmp_path / "manifest.json")
+    urls = [f"{base}/b/", f"{base}/a/"]
+    shared = passage("shared")
+
+    # Run 1: only A has the shared passage, so it is kept under A.
+    pages["/a/"] = "\n\n".join([passage("a1"), shared])
+    pages["/b/"] = passage("b1")
+    write_sitemap(sitemap_path, urls, "2024-01-01")
+    refresh_docs(sitemap_path, FakeEmbeddings(), split_paragraphs, manifest_path=manifest_path, concurrency=1)
+    assert stored_texts(qdrant).count(shared) == 1
+
+    # Run 2: both pages change, B gains the passage and A drops it. A answers
+    # late, so B's copy is deduped against A's old one before A is re-extracted.
+    pages["/a/"] = passage("a2")
+    pages["/b/"] = "\n\n".join([passage("b2"), shared])
+    slow.add("/a/")
+    write_sitemap(sitemap_path, urls, "2024-02-01")
+    refresh_docs(sitemap_path, FakeEmbeddings(), split_paragraphs, manifest_path=manifest_path, concurrency=1)
+
+    texts = stored_texts(qdrant)
+    assert texts.count(shared) == 1
+    assert sorted(texts) == sorted([passage("a2"), passage("b2"), shared])
@@ -0,0 +1,98 @@
+"""Persistent embedding cache shared by every ingestion path in this repo.
+
+Vectors are stored in SQLite as packed float32, keyed by (model name,
+sha256 of the chunk text), so re-ingesting a mostly unchanged corpus costs
+hash lookups instead of transformer forward passes.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings.sqlite3"),
+)
+
+# SQLite limits the number of bound parameters per statement.
+_LOOKUP_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps any LangChain Embeddings and only embeds texts it has not seen before."""
+
+    def __init__(self, embedder: Embeddings, model_name: str, path: str = DEFAULT_CACHE_PATH):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_sha256 BLOB NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_sha256)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def _get_many(self, keys):
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[i:i + _LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    "SELECT text_sha256, vector FROM embeddings WHERE model = ? AND text_sha256 IN (%s)"
+                    % ",".join("?" * len(batch)),
+                    [self.model_name, *batch],
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def _put_many(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_sha256, vector) VALUES (?, ?, ?)",
+                [(self.model_name, key, array("f", vector).tobytes()) for key, vector in items],
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        found = self._get_many(list(dict.fromkeys(keys)))
+
+        # Texts repeated within the batch are embedded once.
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embedder.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), vectors))
+            self._put_many(new_items)
+            # Round-trip through float32 so cached and fresh vectors are identical.
+            for key, vector in new_items:
+                found[key] = array("f", vector).tolist()
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str):
+        # Queries are rarely repeated, so they always go to the model.
+        return self.embedder.embed_query(text)
+
+
+def cached_huggingface_embeddings(model_name: str) -> CachedEmbeddings:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return CachedEmbeddings(HuggingFaceEmbeddings(model_name=model_name), model_name)
@@ -1,17 +1,71 @@
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services.chat_engine import answer_query_to_repo
+from services.chat_engine import answer_query_to_repo, stream_answer_to_repo
+from services.jobs import job_manager, JobQueueFull
 
 ask_router = APIRouter()
 
 class QueryRequest(BaseModel):
     repo_url: str
     question: str
+    sync: bool = False  # fetch the repo and re-embed the files changed since it was indexed
+
+class StreamQueryRequest(QueryRequest):
+    hide_reasoning: bool = False  # drop the model's <think> block from the stream
+
+class IndexRequest(BaseModel):
+    repo_url: str
+    sync: bool = False
 
 @ask_router.post("/ask")
 async def ask_repo_question(req: QueryRequest):
     try:
-        answer = answer_query_to_repo(req.repo_url, req.question)
+        # Retrieval and the LLM call block, so they run on the thread pool and
+        # the event loop stays free for other requests. An index build, if one
+        # is needed, runs on the indexing job pool and this request waits for it.
+        answer = await run_in_threadpool(answer_query_to_repo, req.repo_url, req.question, sync=req.sync)
         return {"answer": answer}
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@ask_router.post("/ask/stream")
+async def ask_repo_question_stream(req: StreamQueryRequest):
+    # A plain generator: StreamingResponse iterates it on the thread pool, so
+    # retrieval and the blocking Groq stream stay off the event loop.
+    def events():
+        try:
+            for event, data in stream_answer_to_repo(
+                req.repo_url, req.question, sync=req.sync, hide_reasoning=req.hide_reasoning
+            ):
+                yield _sse(event, data)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@ask_router.post("/index", status_code=202)
+async def index_repo(req: IndexRequest):
+    try:
+        job = job_manager.submit(req.repo_url, sync=req.sync)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job.id}
+
+@ask_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
@@ -3,4 +3,31 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
\ No newline at end of file
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+# Prefix of the per-repo collections, e.g. github_repo_chat_<repo hash>.
+COLLECTION_NAME = "github_repo_chat"
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# Bump when chunking changes so existing indexes are rebuilt instead of reused.
+SPLITTER = "ast-v1"
+
+# Hybrid retrieval: each retriever contributes RETRIEVAL_CANDIDATES hits and
+# the best RETRIEVAL_K after fusion go into the prompt.
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+
+# Repository loading: files above MAX_FILE_BYTES are skipped, LOADER_WORKERS
+# threads read files concurrently and EMBED_BATCH_SIZE chunks are embedded and
+# uploaded at a time, so memory stays bounded however large the repo is.
+LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", "8"))
+MAX_FILE_BYTES = int(os.getenv("MAX_FILE_BYTES", str(512 * 1024)))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
+# Background indexing: at most INDEX_WORKERS repos are indexed at once and at
+# most MAX_PENDING_JOBS may be queued or running before /api/index refuses more.
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "2"))
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", "16"))
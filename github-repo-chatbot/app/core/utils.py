@@ -1,11 +1,70 @@
+import hashlib
 import os
+import shutil
+import uuid
 from git import Repo
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-CLONE_DIR = os.path.join(BASE_DIR, "data", "cloned_repo")
+DATA_DIR = os.path.join(BASE_DIR, "data")
+REPOS_DIR = os.path.join(DATA_DIR, "repos")
 
-def clone_repo(repo_url: str, dest_folder: str = CLONE_DIR):
+# Only the latest snapshot is needed for indexing: no history, and blobs are
+# fetched for the checked-out tree only.
+SHALLOW_CLONE_OPTIONS = ["--depth=1", "--filter=blob:none", "--single-branch"]
+
+def repo_clone_dir(repo_url: str) -> str:
+    return os.path.join(REPOS_DIR, repo_hash(repo_url))
+
+def clone_repo(repo_url: str, dest_folder: str = None):
+    dest_folder = dest_folder or repo_clone_dir(repo_url)
     if os.path.exists(dest_folder):
-        return dest_folder #Recursively deletes the directory if its already present.
-    Repo.clone_from(repo_url, dest_folder)
+        return dest_folder
+    # Clone next to the destination and move it into place, so a half-finished
+    # clone is never mistaken for a complete one.
+    tmp_folder = f"{dest_folder}.tmp-{uuid.uuid4().hex}"
+    try:
+        Repo.clone_from(repo_url, tmp_folder, multi_options=SHALLOW_CLONE_OPTIONS)
+        os.replace(tmp_folder, dest_folder)
+    finally:
+        if os.path.exists(tmp_folder):
+            shutil.rmtree(tmp_folder, ignore_errors=True)
     return dest_folder
+
+def sync_repo(repo_url: str, dest_folder: str = None):
+    # Like clone_repo, but an existing checkout is fetched and moved to the remote HEAD.
+    dest_folder = dest_folder or repo_clone_dir(repo_url)
+    if not os.path.exists(dest_folder):
+        return clone_repo(repo_url, dest_folder)
+    repo = Repo(dest_folder)
+    repo.git.fetch("--depth=1", "origin", "HEAD")
+    repo.git.reset("--hard", "FETCH_HEAD")
+    return dest_folder
+
+def normalize_repo_url(repo_url: str) -> str:
+    # "https://github.com/a/b", "https://github.com/a/b/" and "https://github.com/a/b.git" are the same repo.
+    url = repo_url.strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-len(".git")]
+    return url
+
+def repo_hash(repo_url: str) -> str:
+    # Short, filesystem- and collection-name-safe id for a repo.
+    return hashlib.sha256(normalize_repo_url(repo_url).encode("utf-8")).hexdigest()[:16]
+
+def get_head_commit(repo_path: str) -> str:
+    return Repo(repo_path).head.commit.hexsha
+
+def diff_commits(repo_path: str, old_sha: str, new_sha: str):
+    """Returns (added or modified paths, deleted paths) between two commits.
+
+    Renames are reported as a delete plus an add, which is what re-indexing needs.
+    """
+    output = Repo(repo_path).git.diff("--name-status", "--no-renames", old_sha, new_sha)
+    changed, deleted = [], []
+    for line in output.splitlines():
+        status, path = line.split("\t", 1)
+        if status == "D":
+            deleted.append(path)
+        else:
+            changed.append(path)
+    return changed, deleted
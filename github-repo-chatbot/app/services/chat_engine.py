@@ -1,35 +1,113 @@
-from langchain_qdrant import QdrantVectorStore
-from langchain_community.embeddings import HuggingFaceEmbeddings
 # from repository_loader import load_repo_documents
-from services.repository_loader import load_repo_documents
-from services.embeddings import embed_documents
+from services.jobs import job_manager
+from services.retrieval import retrieve_chunks
 from core.config import GROQ_API_KEY
 from groq import Groq
 
 client = Groq(api_key=GROQ_API_KEY)
 
-embedder = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+CHAT_MODEL = "deepseek-r1-distill-llama-70b"
 
-def answer_query_to_repo(repo_link: str,question:str):
-    documents = load_repo_documents(repo_link)
-    vec_store = embed_documents(documents)
-    relavant_chunks = vec_store.similarity_search(question)
-    context = ""
-    for doc in relavant_chunks:
-        context += "\n\n" + doc.page_content
-    system_prompt = """
+system_prompt = """
     You are a helpful AI assistant that answers questions of users for understanding github repositories using provided document context.
     Refer to the context and provide a concise, accurate response. If context is missing, reply with "No relevant information found."
     You make sure that the user is able to understand his question in a proper fashion and is able to navigate through the query asked.
     """
-    
-    message = [
+
+def build_messages(relavant_chunks, question: str):
+    context = ""
+    for doc in relavant_chunks:
+        context += "\n\n" + doc.page_content
+    return [
         {"role":"system","content":system_prompt},
         {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
     ]
+
+def answer_query_to_repo(repo_link: str,question:str, sync: bool = False):
+    index_key = job_manager.ensure_index(repo_link, sync=sync)
+    relavant_chunks = retrieve_chunks(index_key, question)
+    message = build_messages(relavant_chunks, question)
     
     response = client.chat.completions.create(
-        model = "deepseek-r1-distill-llama-70b",
+        model = CHAT_MODEL,
         messages=message
     )
-    return response.choices[0].message.content.strip()
\ No newline at end of file
+    return response.choices[0].message.content.strip()
+
+
+class ThinkFilter:
+    """Drops <think>...</think> reasoning from a token stream as it arrives.
+
+    Tags can be split across deltas, so a trailing fragment that could still
+    become a tag is held back until the next delta decides it.
+    """
+
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self.in_think = False
+        self.buffer = ""
+
+    @staticmethod
+    def _partial_tag_length(text: str, tag: str) -> int:
+        for size in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:size]):
+                return size
+        return 0
+
+    def feed(self, text: str) -> str:
+        self.buffer += text
+        visible = []
+        while True:
+            tag = self.CLOSE_TAG if self.in_think else self.OPEN_TAG
+            index = self.buffer.find(tag)
+            if index == -1:
+                break
+            if not self.in_think:
+                visible.append(self.buffer[:index])
+            self.buffer = self.buffer[index + len(tag):]
+            self.in_think = not self.in_think
+        held = self._partial_tag_length(self.buffer, tag)
+        if not self.in_think:
+            visible.append(self.buffer[:len(self.buffer) - held])
+        self.buffer = self.buffer[len(self.buffer) - held:]
+        return "".join(visible)
+
+    def flush(self) -> str:
+        rest = "" if self.in_think else self.buffer
+        self.buffer = ""
+        return rest
+
+
+def _source_of(doc):
+    meta = doc.metadata
+    return {"path": meta.get("path"), "start_line": meta.get("start_line"), "end_line": meta.get("end_line")}
+
+def stream_answer_to_repo(repo_link: str, question: str, sync: bool = False, hide_reasoning: bool = False):
+    """Yields (event, data) pairs: the retrieved sources first, then answer token deltas.
+
+    The sources are sent as soon as retrieval finishes, before the model has
+    produced anything; with hide_reasoning the model's <think> block is dropped.
+    """
+    index_key = job_manager.ensure_index(repo_link, sync=sync)
+    relavant_chunks = retrieve_chunks(index_key, question)
+    yield "sources", [_source_of(doc) for doc in relavant_chunks]
+
+    stream = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=build_messages(relavant_chunks, question),
+        stream=True,
+    )
+    think_filter = ThinkFilter() if hide_reasoning else None
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta and think_filter is not None:
+            delta = think_filter.feed(delta)
+        if delta:
+            yield "token", delta
+    if think_filter is not None:
+        rest = think_filter.flush()
+        if rest:
+            yield "token", rest
+    yield "done", {}
@@ -0,0 +1,182 @@
+import ast
+from pathlib import Path
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
+from core.config import CHUNK_SIZE, CHUNK_OVERLAP
+
+# Languages langchain can split on syntax boundaries (functions, classes, blocks).
+EXTENSION_LANGUAGES = {
+    ".js": Language.JS, ".jsx": Language.JS, ".mjs": Language.JS,
+    ".ts": Language.TS, ".tsx": Language.TS,
+    ".go": Language.GO, ".java": Language.JAVA, ".kt": Language.KOTLIN,
+    ".rs": Language.RUST, ".rb": Language.RUBY, ".php": Language.PHP,
+    ".c": Language.CPP, ".h": Language.CPP, ".cpp": Language.CPP, ".hpp": Language.CPP,
+    ".cs": Language.CSHARP, ".scala": Language.SCALA, ".swift": Language.SWIFT,
+    ".md": Language.MARKDOWN, ".rst": Language.RST, ".html": Language.HTML,
+}
+
+_DEF_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+class _Segment:
+    # A run of source lines [start, end] (1-based, inclusive) and the symbols defined in it.
+    def __init__(self, start, end, kind, symbols=None):
+        self.start = start
+        self.end = end
+        self.kind = kind
+        self.symbols = symbols or []
+
+
+def _fallback_splitter(suffix, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    language = EXTENSION_LANGUAGES.get(suffix)
+    if language is not None:
+        return RecursiveCharacterTextSplitter.from_language(
+            language, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _node_start(node):
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def _symbols_of(node, prefix=""):
+    # (name, start line, end line) for a def/class and, for classes, their methods.
+    name = prefix + node.name
+    symbols = [(name, _node_start(node), node.end_lineno)]
+    if isinstance(node, ast.ClassDef):
+        for child in node.body:
+            if isinstance(child, _DEF_NODES):
+                symbols.extend(_symbols_of(child, prefix=name + "."))
+    return symbols
+
+
+def _assigned_names(node):
+    targets = []
+    if isinstance(node, ast.Assign):
+        targets = node.targets
+    elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+        targets = [node.target]
+    return [(t.id, node.lineno, node.end_lineno) for t in targets if isinstance(t, ast.Name)]
+
+
+def _segments(body, first_line, last_line, lines, chunk_size):
+    """Cuts the statements in body into def/class segments and runs of other code.
+
+    Comments and blank lines between statements go with the statement below
+    them, so the segments cover first_line..last_line without gaps.
+    """
+    segments = []
+    cursor = first_line
+    for node in body:
+        end = node.end_lineno
+        if isinstance(node, _DEF_NODES):
+            size = sum(len(line) for line in lines[cursor - 1:end])
+            if isinstance(node, ast.ClassDef) and size > chunk_size and node.body:
+                # Too big for one chunk: the class header plus one segment per method.
+                header_end = max(_node_start(node.body[0]) - 1, node.lineno)
+                segments.append(_Segment(cursor, header_end, "class", [(node.name, _node_start(node), end)]))
+                for segment in _segments(node.body, header_end + 1, end, lines, chunk_size):
+                    qualified = [(node.name + "." + n, s, e) for n, s, e in segment.symbols]
+                    segment.symbols = qualified + segment.symbols
+                    segments.append(segment)
+            else:
+                symbols = _symbols_of(node)
+                # Methods are also findable by their bare name.
+                symbols.extend((n.split(".")[-1], s, e) for n, s, e in symbols[1:])
+                kind = "class" if isinstance(node, ast.ClassDef) else "function"
+                segments.append(_Segment(cursor, end, kind, symbols))
+        else:
+            if segments and segments[-1].kind == "module":
+                segments[-1].end = end
+            else:
+                segments.append(_Segment(cursor, end, "module"))
+            segments[-1].symbols.extend(_assigned_names(node))
+        cursor = end + 1
+    if cursor <= last_line:
+        if segments:
+            segments[-1].end = last_line
+        else:
+            segments.append(_Segment(cursor, last_line, "module"))
+    return segments
+
+
+def _merge_small(segments, lines, chunk_size):
+    # Neighbouring segments are packed together up to chunk_size, so small
+    # helpers and constants don't each cost a chunk of their own.
+    def size_of(segment):
+        return sum(len(line) for line in lines[segment.start - 1:segment.end])
+
+    merged = []
+    for segment in segments:
+        if merged and size_of(merged[-1]) + size_of(segment) <= chunk_size:
+            previous = merged[-1]
+            previous.end = segment.end
+            previous.symbols.extend(segment.symbols)
+            if previous.kind != segment.kind:
+                previous.kind = "mixed"
+        else:
+            merged.append(segment)
+    return merged
+
+
+def split_python_source(text: str, chunk_size: int = CHUNK_SIZE):
+    """Splits Python source along module, class and function boundaries.
+
+    Returns a list of (content, start_line, end_line, kind, symbols) where
+    symbols are (name, start_line, end_line) tuples. Raises SyntaxError when
+    the source does not parse.
+    """
+    tree = ast.parse(text)
+    lines = text.splitlines(keepends=True)
+    if not lines:
+        return []
+    segments = _merge_small(_segments(tree.body, 1, len(lines), lines, chunk_size), lines, chunk_size)
+
+    pieces = []
+    for segment in segments:
+        content = "".join(lines[segment.start - 1:segment.end])
+        if not content.strip():
+            continue
+        if len(content) <= chunk_size:
+            pieces.append((content, segment.start, segment.end, segment.kind, segment.symbols))
+            continue
+        # A single function that is still too long is cut on Python syntax
+        # boundaries; every piece keeps the symbols so a lookup finds them all.
+        # The splitter strips the whitespace around each part, so its lines are
+        # found by locating the part in content rather than by counting.
+        splitter = _fallback_splitter(".py", chunk_size=chunk_size, chunk_overlap=0)
+        cursor = 0
+        for part in splitter.split_text(content):
+            offset = content.find(part, cursor)
+            if offset < 0:
+                offset = cursor
+            start = segment.start + content.count("\n", 0, offset)
+            pieces.append((part, start, start + part.count("\n"), segment.kind, segment.symbols))
+            cursor = offset + len(part)
+    return pieces
+
+
+def split_code_documents(docs):
+    """Splits loaded repo files into chunks, yielding (chunk, symbols) pairs.
+
+    Python files are cut with ast; everything else falls back to langchain's
+    language-aware or plain recursive splitter and has no symbols.
+    """
+    for doc in docs:
+        suffix = Path(doc.metadata.get("path", doc.metadata.get("source", ""))).suffix.lower()
+        pieces = None
+        if suffix == ".py":
+            try:
+                pieces = split_python_source(doc.page_content)
+            except (SyntaxError, ValueError):
+                pieces = None
+        if pieces is None:
+            for chunk in _fallback_splitter(suffix).split_documents([doc]):
+                chunk.metadata["chunk_type"] = "text"
+                yield chunk, []
+            continue
+        for content, start, end, kind, symbols in pieces:
+            metadata = dict(doc.metadata, start_line=start, end_line=end, chunk_type=kind)
+            yield Document(page_content=content, metadata=metadata), symbols
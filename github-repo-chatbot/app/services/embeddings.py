@@ -1,16 +1,118 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import os
+import sys
+import uuid
+from langchain_core.documents import Document
 from langchain_qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient, models
+from core.config import QDRANT_URL, EMBEDDING_MODEL, EMBED_BATCH_SIZE
+from services.code_splitter import split_code_documents
 
-embedder = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# embedding_cache lives at the repo root and is shared with the other bots.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from embedding_cache import cached_huggingface_embeddings
 
-def embed_documents(docs):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    split_docs = text_splitter.split_documents(documents=docs)
-    vector_store = QdrantVectorStore.from_documents(
-        documents=split_docs,
-        url="http://localhost:6333",
-        collection_name="github_repo_chat",
-        embedding=embedder
+embedder = cached_huggingface_embeddings(EMBEDDING_MODEL)
+
+qdrant = QdrantClient(url=QDRANT_URL)
+
+def index_filter(index_id: str):
+    return models.Filter(
+        must=[models.FieldCondition(key="metadata.index_id", match=models.MatchValue(value=index_id))]
+    )
+
+def paths_filter(index_id: str, paths):
+    return models.Filter(
+        must=[
+            models.FieldCondition(key="metadata.index_id", match=models.MatchValue(value=index_id)),
+            models.FieldCondition(key="metadata.path", match=models.MatchAny(any=list(paths))),
+        ]
     )
-    return vector_store
\ No newline at end of file
+
+def get_vector_store(collection_name: str):
+    return QdrantVectorStore(client=qdrant, collection_name=collection_name, embedding=embedder)
+
+def delete_index(collection_name: str, index_id: str):
+    if qdrant.collection_exists(collection_name):
+        qdrant.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(filter=index_filter(index_id)),
+        )
+
+def delete_other_indexes(collection_name: str, index_id: str):
+    # Points built with an older splitter or model carry another index_id and are never searched again.
+    if qdrant.collection_exists(collection_name):
+        qdrant.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(
+                must_not=[models.FieldCondition(key="metadata.index_id", match=models.MatchValue(value=index_id))]
+            )),
+        )
+
+def delete_paths(collection_name: str, index_id: str, paths):
+    if not paths or not qdrant.collection_exists(collection_name):
+        return
+    qdrant.delete(
+        collection_name=collection_name,
+        points_selector=models.FilterSelector(filter=paths_filter(index_id, paths)),
+    )
+
+def ensure_collection(collection_name: str):
+    if qdrant.collection_exists(collection_name):
+        return
+    vector_size = len(embedder.embed_query("vector size probe"))
+    qdrant.create_collection(
+        collection_name=collection_name,
+        vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+    )
+    for field_name in ("metadata.index_id", "metadata.path"):
+        qdrant.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=models.PayloadSchemaType.KEYWORD,
+        )
+
+def chunk_id(index_id: str, chunk) -> str:
+    # Deterministic, so the symbol table can point at a chunk before it is uploaded.
+    meta = chunk.metadata
+    raw = f"{index_id}:{meta.get('path')}:{meta.get('start_line')}:{meta.get('end_line')}:{chunk.page_content}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, raw))
+
+def fetch_chunks(collection_name: str, ids):
+    # Direct point lookups, for when the symbol table already knows which chunks answer a question.
+    points = qdrant.retrieve(collection_name=collection_name, ids=list(ids), with_payload=True)
+    return [
+        Document(
+            page_content=point.payload["page_content"],
+            metadata=dict(point.payload.get("metadata") or {}, _id=point.id),
+        )
+        for point in points
+    ]
+
+def _upload(vector_store, batch, batch_ids, progress):
+    vector_store.add_documents(batch, ids=batch_ids)
+    if progress is not None:
+        progress.chunks_embedded += len(batch)
+
+def embed_documents(docs, collection_name: str, index_id: str, symbols=None, lexical=None, progress=None):
+    # docs may be a generator: chunks are embedded and uploaded EMBED_BATCH_SIZE
+    # at a time while the loader is still reading the rest of the repo.
+    # Python definitions found while splitting are recorded in symbols (a
+    # SymbolIndex) and every chunk's terms in lexical (a BM25Index).
+    ensure_collection(collection_name)
+    vector_store = get_vector_store(collection_name)
+    batch, batch_ids = [], []
+    for chunk, chunk_symbols in split_code_documents(docs):
+        chunk.metadata["index_id"] = index_id
+        batch.append(chunk)
+        batch_ids.append(chunk_id(index_id, chunk))
+        if symbols is not None:
+            for name, start_line, end_line in dict.fromkeys(chunk_symbols):
+                symbols.add(chunk.metadata["path"], name, start_line, end_line, batch_ids[-1])
+        if lexical is not None:
+            lexical.add(batch_ids[-1], chunk.metadata["path"], chunk.page_content)
+        if len(batch) >= EMBED_BATCH_SIZE:
+            _upload(vector_store, batch, batch_ids, progress)
+            batch, batch_ids = [], []
+    if batch:
+        _upload(vector_store, batch, batch_ids, progress)
+    return vector_store
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import threading
+from typing import NamedTuple, Optional
+
+from core.config import COLLECTION_NAME
+from core.utils import DATA_DIR, repo_hash
+
+REGISTRY_PATH = os.path.join(DATA_DIR, "index_registry.json")
+
+
+class IndexKey(NamedTuple):
+    repo_url: str
+    commit_sha: str
+    embedding_model: str
+    chunk_size: int
+    chunk_overlap: int
+    splitter: str
+
+    @property
+    def index_id(self) -> str:
+        # Names the points built for this repo with this model and splitter,
+        # whatever commit they were built from. Stored on every point so an
+        # index can be searched or dropped with a payload filter.
+        raw = "|".join([self.repo_url, self.embedding_model, str(self.chunk_size), str(self.chunk_overlap), self.splitter])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    @property
+    def collection_name(self) -> str:
+        # One collection per repo, so repos never share (or grow) each other's points.
+        return f"{COLLECTION_NAME}_{repo_hash(self.repo_url)}"
+
+
+class IndexRegistry:
+    """Records which (repo, commit, model, splitter) indexes already exist in Qdrant."""
+
+    def __init__(self, path: str = REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, entries: dict):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, key: IndexKey) -> Optional[dict]:
+        # Re-read on every lookup so indexes built by another worker are seen.
+        with self._lock:
+            entry = self._read().get(key.index_id)
+        if entry and entry["commit_sha"] == key.commit_sha:
+            return entry
+        return None
+
+    def latest(self, key: IndexKey) -> Optional[dict]:
+        # The entry for the same repo, model and splitter at whatever commit it was last built.
+        with self._lock:
+            return self._read().get(key.index_id)
+
+    def register(self, key: IndexKey) -> dict:
+        entry = dict(key._asdict(), collection_name=key.collection_name)
+        with self._lock:
+            entries = self._read()
+            entries[key.index_id] = entry
+            self._write(entries)
+        return entry
+
+    def drop_others(self, key: IndexKey) -> list:
+        # Forgets the repo's indexes built with another model or splitter; returns their index ids.
+        with self._lock:
+            entries = self._read()
+            stale = [
+                index_id for index_id, entry in entries.items()
+                if entry["repo_url"] == key.repo_url and index_id != key.index_id
+            ]
+            if stale:
+                for index_id in stale:
+                    del entries[index_id]
+                self._write(entries)
+        return stale
+
+
+registry = IndexRegistry()
@@ -0,0 +1,123 @@
+import os
+import threading
+import weakref
+from git.exc import GitCommandError
+from core.config import EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, SPLITTER
+from core.utils import clone_repo, sync_repo, get_head_commit, normalize_repo_url, diff_commits, repo_clone_dir, repo_hash
+from services.repository_loader import load_repo_documents, load_repo_files
+from services.embeddings import embed_documents, delete_index, delete_other_indexes, delete_paths
+from services.index_registry import IndexKey, registry
+from services.symbol_index import SymbolIndex
+from services.lexical_index import BM25Index
+
+# One lock per repo: concurrent requests for the same repo share a single
+# clone and index build instead of each starting their own. A lock lives only
+# while some thread holds or waits for it, so the map does not grow with every
+# repo ever asked about.
+_repo_locks = weakref.WeakValueDictionary()
+_repo_locks_guard = threading.Lock()
+
+def _repo_lock(repo_url: str) -> threading.Lock:
+    with _repo_locks_guard:
+        key = repo_hash(repo_url)
+        lock = _repo_locks.get(key)
+        if lock is None:
+            lock = _repo_locks[key] = threading.Lock()
+        return lock
+
+def _drop_stale_indexes(key: IndexKey):
+    # After a SPLITTER or model change the repo's old index is unreachable;
+    # its points, symbol table and BM25 postings are removed once the new one is live.
+    delete_other_indexes(key.collection_name, key.index_id)
+    for stale_id in registry.drop_others(key):
+        for path in (SymbolIndex(stale_id).path, BM25Index(stale_id).path):
+            if os.path.exists(path):
+                os.remove(path)
+
+def _count_files(docs, progress):
+    for doc in docs:
+        progress.files_loaded += 1
+        yield doc
+
+def _index_key(repo_url: str, repo_path: str) -> IndexKey:
+    return IndexKey(
+        repo_url=normalize_repo_url(repo_url),
+        commit_sha=get_head_commit(repo_path),
+        embedding_model=EMBEDDING_MODEL,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        splitter=SPLITTER,
+    )
+
+def cached_repo_index(repo_url: str):
+    """The index key for the checkout's current HEAD if that index is already built, else None."""
+    repo_path = repo_clone_dir(repo_url)
+    if os.path.exists(repo_path):
+        key = _index_key(repo_url, repo_path)
+        if registry.lookup(key) is not None:
+            return key
+    return None
+
+def ensure_repo_index(repo_url: str, sync: bool = False, progress=None) -> IndexKey:
+    """Returns the index for the repo's current HEAD, building it only on a registry miss.
+
+    With sync=True the checkout is first fetched up to the remote HEAD. When an
+    older commit of the repo is already indexed, only the files that changed
+    between the two commits are re-embedded.
+
+    progress, when given, is an object (an IndexJob) whose stage, files_loaded
+    and chunks_embedded attributes are updated while the index is built.
+    """
+    if not sync:
+        key = cached_repo_index(repo_url)
+        if key is not None:
+            return key
+
+    if progress is not None:
+        progress.stage = "waiting"
+    with _repo_lock(repo_url):
+        return _build_repo_index(repo_url, sync, progress)
+
+def _build_repo_index(repo_url: str, sync: bool, progress) -> IndexKey:
+    if progress is not None:
+        progress.stage = "cloning"
+    repo_path = sync_repo(repo_url) if sync else clone_repo(repo_url)
+    key = _index_key(repo_url, repo_path)
+    # Another request may have built this index while we waited for the lock.
+    if registry.lookup(key) is not None:
+        return key
+
+    collection_name = key.collection_name
+    previous = registry.latest(key)
+    if previous is not None:
+        try:
+            changed, deleted = diff_commits(repo_path, previous["commit_sha"], key.commit_sha)
+        except GitCommandError:
+            # The indexed commit is gone from the checkout (e.g. it was re-cloned).
+            previous = None
+
+    if previous is None:
+        # Points left over from an older commit (or a half-finished build) would
+        # otherwise be mixed into the results for this one.
+        delete_index(collection_name, key.index_id)
+        symbols = SymbolIndex(key.index_id)
+        lexical = BM25Index(key.index_id)
+        documents = load_repo_documents(repo_url)
+    else:
+        delete_paths(collection_name, key.index_id, changed + deleted)
+        symbols = SymbolIndex.load(key.index_id)
+        symbols.remove_paths(changed + deleted)
+        lexical = BM25Index.load(key.index_id)
+        lexical.remove_paths(changed + deleted)
+        documents = load_repo_files(repo_path, changed)
+
+    if progress is not None:
+        progress.stage = "embedding"
+        documents = _count_files(documents, progress)
+    embed_documents(documents, collection_name, key.index_id, symbols, lexical, progress=progress)
+    symbols.save()
+    lexical.save()
+    registry.register(key)
+    if previous is None:
+        _drop_stale_indexes(key)
+    return key
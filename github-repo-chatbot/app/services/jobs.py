@@ -0,0 +1,124 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import INDEX_WORKERS, MAX_PENDING_JOBS
+from core.utils import normalize_repo_url
+from services.indexer import cached_repo_index, ensure_repo_index
+
+# Finished jobs are kept for polling, but only this many of them.
+MAX_FINISHED_JOBS = 1000
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class IndexJob:
+    """A background index build; its counters are updated by the indexer as it goes."""
+
+    def __init__(self, repo_url: str, sync: bool):
+        self.id = uuid.uuid4().hex
+        self.repo_url = repo_url
+        self.sync = sync
+        self.status = "queued"
+        self.stage = None
+        self.files_loaded = 0
+        self.chunks_embedded = 0
+        self.commit_sha = None
+        self.key = None
+        self.error = None
+        self.exception = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "repo_url": self.repo_url,
+            "status": self.status,
+            "stage": self.stage,
+            "files_loaded": self.files_loaded,
+            "chunks_embedded": self.chunks_embedded,
+            "commit_sha": self.commit_sha,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    def __init__(self, workers: int = INDEX_WORKERS, max_pending: int = MAX_PENDING_JOBS):
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="indexer")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, repo_url: str, sync: bool = False, join: bool = False) -> IndexJob:
+        # With join, an unfinished job for the same repo is returned instead of queueing another.
+        with self._lock:
+            if join:
+                normalized = normalize_repo_url(repo_url)
+                for job in self._jobs.values():
+                    if not job.finished and job.sync == sync and normalize_repo_url(job.repo_url) == normalized:
+                        return job
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} indexing jobs are already queued or running.")
+            job = IndexJob(repo_url, sync)
+            self._jobs[job.id] = job
+            self._trim()
+        self._pool.submit(self._run, job)
+        return job
+
+    def ensure_index(self, repo_url: str, sync: bool = False):
+        """Returns the repo's IndexKey, waiting for a build on the job pool when there is none.
+
+        A repo that is already being indexed is joined rather than built again,
+        and new builds count against INDEX_WORKERS and MAX_PENDING_JOBS like
+        /api/index jobs do. Raises JobQueueFull, or the build's own exception.
+        """
+        if not sync:
+            key = cached_repo_index(repo_url)
+            if key is not None:
+                return key
+        job = self.submit(repo_url, sync=sync, join=True)
+        job.done.wait()
+        if job.exception is not None:
+            raise job.exception
+        return job.key
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IndexJob):
+        job.status = "running"
+        try:
+            key = ensure_repo_index(job.repo_url, sync=job.sync, progress=job)
+            job.key = key
+            job.commit_sha = key.commit_sha
+            job.stage = None
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.exception = e
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+
+
+job_manager = JobManager()
@@ -0,0 +1,137 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from core.utils import DATA_DIR
+
+LEXICAL_DIR = os.path.join(DATA_DIR, "lexical")
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_WORD_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize_code(text: str):
+    """Splits text into lowercase terms, keeping identifiers whole and in parts.
+
+    "clone_repo" yields clone_repo, clone, repo; "HTTPServerError" yields
+    httpservererror, http, server, error. Exact identifiers therefore match
+    exactly, and questions phrased in plain words still match their parts.
+    """
+    terms = []
+    for identifier in _IDENTIFIER.findall(text):
+        terms.append(identifier.lower())
+        parts = [p.lower() for chunk in identifier.split("_") for p in _WORD_PART.findall(chunk)]
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60, limit: int = None):
+    """Fuses ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    if limit is not None:
+        return heapq.nlargest(limit, scores, key=scores.get)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class BM25Index:
+    """Okapi BM25 over identifier-aware terms, kept next to a repo's vector collection.
+
+    Only per-chunk term counts are persisted; the postings lists are rebuilt on
+    load. Chunks are grouped by file so incremental re-indexing can drop them.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, index_id: str):
+        self.index_id = index_id
+        self.path = os.path.join(LEXICAL_DIR, f"{index_id}.json")
+        self.doc_terms = {}
+        self.doc_path = {}
+        self.doc_len = {}
+        self.total_len = 0
+        self.postings = {}
+
+    @classmethod
+    def load(cls, index_id: str) -> "BM25Index":
+        index = cls(index_id)
+        if os.path.exists(index.path):
+            with open(index.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for chunk_id, terms in data["doc_terms"].items():
+                index._add_counts(chunk_id, data["doc_path"][chunk_id], terms)
+        return index
+
+    def save(self):
+        os.makedirs(LEXICAL_DIR, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"doc_terms": self.doc_terms, "doc_path": self.doc_path}, f)
+        os.replace(tmp_path, self.path)
+
+    def _add_counts(self, chunk_id, path, counts):
+        self.doc_terms[chunk_id] = counts
+        self.doc_path[chunk_id] = path
+        length = sum(counts.values())
+        self.doc_len[chunk_id] = length
+        self.total_len += length
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[chunk_id] = tf
+
+    def add(self, chunk_id: str, path: str, text: str):
+        if chunk_id in self.doc_terms:
+            return
+        self._add_counts(chunk_id, path, dict(Counter(tokenize_code(text))))
+
+    def remove_paths(self, paths):
+        paths = set(paths)
+        for chunk_id in [c for c, p in self.doc_path.items() if p in paths]:
+            for term in self.doc_terms.pop(chunk_id):
+                postings = self.postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self.postings[term]
+            del self.doc_path[chunk_id]
+            self.total_len -= self.doc_len.pop(chunk_id)
+
+    def search(self, query: str, k: int = 20):
+        """Returns up to k (chunk_id, score) pairs, best first."""
+        n_docs = len(self.doc_len)
+        if not n_docs:
+            return []
+        avg_len = self.total_len / n_docs
+        scores = {}
+        for term in set(tokenize_code(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[chunk_id] / avg_len)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_lexical_index(index_id: str) -> BM25Index:
+    # Loaded once per process and reloaded only when another build rewrote the file.
+    path = os.path.join(LEXICAL_DIR, f"{index_id}.json")
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with _cache_lock:
+        cached = _cache.get(index_id)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, BM25Index.load(index_id))
+            _cache[index_id] = cached
+        return cached[1]
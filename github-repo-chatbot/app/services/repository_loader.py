@@ -1,13 +1,115 @@
-from langchain_community.document_loaders import DirectoryLoader, TextLoader, PythonLoader
-from core.utils import clone_repo
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from git import Repo
+from git.exc import InvalidGitRepositoryError
+from langchain_core.documents import Document
+from core.utils import clone_repo
+from core.config import LOADER_WORKERS, MAX_FILE_BYTES
+
+# Extensions and file names that never contain anything worth answering questions from.
+DENIED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".svg", ".webp", ".pdf",
+    ".zip", ".tar", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".jar", ".war",
+    ".exe", ".dll", ".so", ".dylib", ".o", ".a", ".class", ".pyc", ".whl",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot", ".mp3", ".mp4", ".mov", ".wav",
+    ".db", ".sqlite", ".sqlite3", ".pkl", ".npy", ".npz", ".parquet", ".lock", ".map",
+}
+DENIED_FILENAMES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Pipfile.lock",
+    "Cargo.lock", "composer.lock", "Gemfile.lock", "go.sum",
+}
+DENIED_SUFFIXES = (".min.js", ".min.css", ".bundle.js")
+
+BINARY_SNIFF_BYTES = 8192
+
+def _list_repo_files(repo_path):
+    # git already knows which files .gitignore excludes, and never lists .git/ itself.
+    try:
+        output = Repo(repo_path).git.ls_files("--cached", "--others", "--exclude-standard", "-z")
+        return [p for p in output.split("\0") if p]
+    except InvalidGitRepositoryError:
+        paths = []
+        for root, dirs, files in os.walk(repo_path):
+            dirs[:] = [d for d in dirs if d != ".git"]
+            for name in files:
+                paths.append(Path(os.path.relpath(os.path.join(root, name), repo_path)).as_posix())
+        return paths
+
+def _is_indexable_path(path, allowed_extensions, denied_extensions):
+    name = path.rsplit("/", 1)[-1]
+    suffix = Path(name).suffix.lower()
+    if name in DENIED_FILENAMES or name.endswith(DENIED_SUFFIXES):
+        return False
+    if allowed_extensions is not None:
+        return suffix in allowed_extensions
+    return suffix not in denied_extensions
+
+def _inside_repo(repo_root, file_path):
+    # A cloned repo controls its symlinks, so one could point at /proc/self/environ or ~/.ssh.
+    if os.path.islink(file_path):
+        return False
+    real_path = os.path.realpath(file_path)
+    return os.path.commonpath([repo_root, real_path]) == repo_root
+
+def _read_file(repo_path, path, max_file_bytes):
+    file_path = os.path.join(repo_path, path)
+    try:
+        if not _inside_repo(os.path.realpath(repo_path), file_path):
+            return None
+        if not os.path.isfile(file_path) or os.path.getsize(file_path) > max_file_bytes:
+            return None
+        with open(file_path, "rb") as f:
+            data = f.read(max_file_bytes + 1)
+    except OSError:
+        return None
+    if len(data) > max_file_bytes or b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    # "path" is repo-relative, which is what git diffs report, so it is the key
+    # used to find and replace a file's points when the repo is re-synced.
+    return Document(page_content=text, metadata={"source": file_path, "path": path})
+
+def _ordered_parallel_map(fn, items, workers):
+    # Only a fixed window of reads is in flight, so a huge repo never ends up in memory at once.
+    window = workers * 4
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_repo_documents(
+    repo_path: str,
+    paths=None,
+    allowed_extensions=None,
+    denied_extensions=DENIED_EXTENSIONS,
+    max_file_bytes: int = MAX_FILE_BYTES,
+    workers: int = LOADER_WORKERS,
+):
+    """Yields one Document per indexable text file, reading files on a thread pool.
+
+    Files ignored by .gitignore, lockfiles, minified bundles, binaries (sniffed
+    for NUL bytes), files above max_file_bytes and symlinks or paths that
+    resolve outside repo_path are skipped. Pass paths to
+    load only those repo-relative files.
+    """
+    if paths is None:
+        paths = _list_repo_files(repo_path)
+    indexable = (p for p in paths if _is_indexable_path(p, allowed_extensions, denied_extensions))
+    for doc in _ordered_parallel_map(lambda p: _read_file(repo_path, p, max_file_bytes), indexable, workers):
+        if doc is not None:
+            yield doc
+
 def load_repo_documents(repo_url: str):
-    repo_path = clone_repo(repo_url)
-    loader = DirectoryLoader(
-        path=repo_path,
-        glob="**/*",
-        loader_cls=lambda p: PythonLoader(p) if Path(p).suffix == '.py' else TextLoader(p),
-        recursive=True,
-        show_progress=True,
-    )
-    return loader.load()
+    return iter_repo_documents(clone_repo(repo_url))
+
+def load_repo_files(repo_path: str, paths):
+    return iter_repo_documents(repo_path, paths=paths)
@@ -0,0 +1,32 @@
+from core.config import RETRIEVAL_K, RETRIEVAL_CANDIDATES
+from services.embeddings import get_vector_store, index_filter, fetch_chunks
+from services.index_registry import IndexKey
+from services.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from services.symbol_index import get_symbol_index
+
+def hybrid_search(index_key: IndexKey, question: str, k: int = RETRIEVAL_K):
+    """Vector and BM25 hits for the question, fused by reciprocal rank."""
+    vec_store = get_vector_store(index_key.collection_name)
+    vector_hits = vec_store.similarity_search(
+        question, k=RETRIEVAL_CANDIDATES, filter=index_filter(index_key.index_id)
+    )
+    docs_by_id = {doc.metadata["_id"]: doc for doc in vector_hits}
+    lexical_hits = get_lexical_index(index_key.index_id).search(question, k=RETRIEVAL_CANDIDATES)
+
+    fused = reciprocal_rank_fusion(
+        [list(docs_by_id), [chunk_id for chunk_id, _ in lexical_hits]], limit=k
+    )
+    # Chunks only BM25 found still need their text from Qdrant.
+    missing = [chunk_id for chunk_id in fused if chunk_id not in docs_by_id]
+    if missing:
+        for doc in fetch_chunks(index_key.collection_name, missing):
+            docs_by_id[doc.metadata["_id"]] = doc
+    return [docs_by_id[chunk_id] for chunk_id in fused if chunk_id in docs_by_id]
+
+def retrieve_chunks(index_key: IndexKey, question: str):
+    # Questions that name a function, class or constant are answered from its
+    # definition directly; everything else goes through hybrid search.
+    symbol_hits = get_symbol_index(index_key.index_id).find_in_question(question)
+    if symbol_hits:
+        return fetch_chunks(index_key.collection_name, (hit["chunk_id"] for hit in symbol_hits))
+    return hybrid_search(index_key, question)
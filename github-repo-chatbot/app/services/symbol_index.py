@@ -0,0 +1,104 @@
+import json
+import os
+import re
+import threading
+
+from core.utils import DATA_DIR
+
+SYMBOLS_DIR = os.path.join(DATA_DIR, "symbols")
+
+_BACKTICKED = re.compile(r"`([^`]+)`")
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+
+def _looks_like_identifier(token: str) -> bool:
+    # Plain English words ("file", "index") are left to vector search; only
+    # tokens that are clearly code names are resolved through the symbol table.
+    return "_" in token or "." in token or token[1:] != token[1:].lower()
+
+
+class SymbolIndex:
+    """Maps symbol names to where they are defined: file, line range and chunk id.
+
+    Entries are grouped by file so an incremental re-index can drop a changed
+    file's symbols before adding the new ones.
+    """
+
+    def __init__(self, index_id: str):
+        self.index_id = index_id
+        self.path = os.path.join(SYMBOLS_DIR, f"{index_id}.json")
+        self.by_file = {}
+        self.by_name = {}
+
+    @classmethod
+    def load(cls, index_id: str) -> "SymbolIndex":
+        index = cls(index_id)
+        if os.path.exists(index.path):
+            with open(index.path, "r", encoding="utf-8") as f:
+                for path, entries in json.load(f).items():
+                    for name, start_line, end_line, chunk_id in entries:
+                        index.add(path, name, start_line, end_line, chunk_id)
+        return index
+
+    def save(self):
+        os.makedirs(SYMBOLS_DIR, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.by_file, f)
+        os.replace(tmp_path, self.path)
+
+    def add(self, path: str, name: str, start_line: int, end_line: int, chunk_id: str):
+        entry = [name, start_line, end_line, chunk_id]
+        self.by_file.setdefault(path, []).append(entry)
+        self.by_name.setdefault(name, []).append({
+            "name": name,
+            "path": path,
+            "start_line": start_line,
+            "end_line": end_line,
+            "chunk_id": chunk_id,
+        })
+
+    def remove_paths(self, paths):
+        paths = set(paths)
+        removed = set()
+        for path in paths:
+            for name, *_ in self.by_file.pop(path, []):
+                removed.add(name)
+        for name in removed:
+            remaining = [e for e in self.by_name[name] if e["path"] not in paths]
+            if remaining:
+                self.by_name[name] = remaining
+            else:
+                del self.by_name[name]
+
+    def lookup(self, name: str):
+        return self.by_name.get(name, [])
+
+    def find_in_question(self, question: str, limit: int = 8):
+        """Returns the definitions of the code identifiers the question names."""
+        candidates = _BACKTICKED.findall(question)
+        candidates += [t for t in _IDENTIFIER.findall(question) if _looks_like_identifier(t)]
+        hits, seen = [], set()
+        for candidate in candidates:
+            name = candidate.strip().rstrip("()")
+            for entry in self.lookup(name):
+                if entry["chunk_id"] not in seen:
+                    seen.add(entry["chunk_id"])
+                    hits.append(entry)
+        return hits[:limit]
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_symbol_index(index_id: str) -> SymbolIndex:
+    # Loaded once per process and reloaded only when another build rewrote the file.
+    path = os.path.join(SYMBOLS_DIR, f"{index_id}.json")
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with _cache_lock:
+        cached = _cache.get(index_id)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, SymbolIndex.load(index_id))
+            _cache[index_id] = cached
+        return cached[1]
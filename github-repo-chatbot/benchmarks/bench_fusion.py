@@ -0,0 +1,79 @@
+"""Latency of the hybrid retrieval fusion step.
+
+Times reciprocal_rank_fusion over vector + BM25 candidate lists of several
+sizes, and BM25Index.search over a synthetic corpus, so changes to either
+can be checked against the vector lookup and LLM call they sit next to.
+
+    python benchmarks/bench_fusion.py [--chunks 20000] [--repeat 200]
+
+Every measurement takes --repeat samples, so their percentiles compare.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from services.lexical_index import BM25Index, reciprocal_rank_fusion
+
+WORDS = [
+    "clone", "repo", "index", "commit", "embed", "chunk", "vector", "store", "query", "answer",
+    "load", "file", "path", "split", "symbol", "token", "search", "fusion", "rank", "score",
+]
+
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    # Inclusive percentiles stay within the samples and never put p95 below p50.
+    percentiles = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    return {
+        "mean_us": round(statistics.fmean(samples), 2),
+        "p50_us": round(percentiles[49], 2),
+        "p95_us": round(percentiles[94], 2),
+    }
+
+
+def _synthetic_chunk(rng):
+    lines = []
+    for _ in range(rng.randint(10, 40)):
+        a, b = rng.sample(WORDS, 2)
+        lines.append(f"def {a}_{b}{rng.randint(0, 500)}(self): return {b.title()}{a.title()}()")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print("reciprocal_rank_fusion (2 lists, 50% overlap)")
+    for size in (10, 20, 50, 100, 1000):
+        ids = [uuid.uuid4().hex for _ in range(size * 3 // 2)]
+        vector_ids = rng.sample(ids, size)
+        lexical_ids = rng.sample(ids, size)
+        result = _timed(lambda: reciprocal_rank_fusion([vector_ids, lexical_ids], limit=4), args.repeat)
+        print(f"  candidates={size:>5}  {result}")
+
+    index = BM25Index("bench")
+    start = time.perf_counter()
+    for i in range(args.chunks):
+        index.add(str(i), f"file_{i % 500}.py", _synthetic_chunk(rng))
+    build_s = time.perf_counter() - start
+    print(f"BM25Index: {args.chunks} chunks, {len(index.postings)} terms, built in {build_s:.2f}s")
+    for query in ("how is the repo cloned", "clone_repo", "where are vector scores fused by rank"):
+        result = _timed(lambda: index.search(query, k=20), args.repeat)
+        print(f"  search {query!r:45} {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""Benchmark for the repo indexing pipeline: load -> split -> embed -> store.
+
+Generates a synthetic git repo of configurable size, runs each stage of the
+pipeline on it and reports files/s, chunks/s, embeddings/s, wall time and the
+resident set size (RSS) at the start of each stage and at its peak. The peak
+is sampled from a background thread while the stage runs, so native memory
+(model weights, numpy and Qdrant buffers) counts and stages do not inherit
+each other's high-water mark the way ru_maxrss would. The end-to-end run calls the app's own
+embed_documents, chunk ids, SymbolIndex and BM25Index included, against an
+in-memory Qdrant (--store memory) or a store that drops the vectors
+(--store discard). Results are printed and, with --output, written as JSON so
+runs can be compared.
+
+    python benchmarks/bench_indexing.py --files 500 --embedder fake --output run.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "app"))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+from git import Repo
+from qdrant_client import QdrantClient, models
+
+from core.config import EMBED_BATCH_SIZE, LOADER_WORKERS
+from services.code_splitter import split_code_documents
+from services.lexical_index import BM25Index
+from services.repository_loader import iter_repo_documents
+from services.symbol_index import SymbolIndex
+
+WORDS = [
+    "clone", "repo", "index", "commit", "embed", "chunk", "vector", "store", "query", "answer",
+    "load", "file", "path", "split", "symbol", "token", "search", "fusion", "rank", "score",
+]
+
+
+def _python_file(rng, functions):
+    parts = ['"""Synthetic module."""', "import os", "", f"LIMIT_{rng.randint(0, 99)} = {rng.randint(1, 1000)}", ""]
+    for i in range(functions):
+        a, b = rng.sample(WORDS, 2)
+        body = "\n".join(f"    {rng.choice(WORDS)}_{j} = {a}_{b}_{i}_helper({j})" for j in range(rng.randint(3, 15)))
+        if i % 4 == 0:
+            parts.append(f"class {a.title()}{b.title()}{i}:\n    def run(self, {a}):\n{body}\n        return {a}\n")
+        else:
+            parts.append(f"def {a}_{b}_{i}({a}, {b}=None):\n{body}\n    return {a}\n")
+    return "\n\n".join(parts)
+
+
+def _markdown_file(rng, sections):
+    return "\n\n".join(
+        f"## {' '.join(rng.sample(WORDS, 3)).title()}\n\n" + " ".join(rng.choices(WORDS, k=120))
+        for _ in range(sections)
+    )
+
+
+def make_synthetic_repo(path, files, functions_per_file, seed=0):
+    """Writes a git repo with a mix of Python, Markdown and ignored/binary files."""
+    rng = random.Random(seed)
+    repo = Repo.init(path)
+    with open(os.path.join(path, ".gitignore"), "w") as f:
+        f.write("build/\n")
+    os.makedirs(os.path.join(path, "build"), exist_ok=True)
+    for i in range(files):
+        package = os.path.join(path, f"pkg_{i % 20}")
+        os.makedirs(package, exist_ok=True)
+        if i % 5 == 4:
+            with open(os.path.join(package, f"notes_{i}.md"), "w") as f:
+                f.write(_markdown_file(rng, functions_per_file // 2 + 1))
+        else:
+            with open(os.path.join(package, f"module_{i}.py"), "w") as f:
+                f.write(_python_file(rng, functions_per_file))
+        if i % 50 == 0:
+            # Files the loader must skip: binaries and ignored build output.
+            with open(os.path.join(package, f"blob_{i}.bin"), "wb") as f:
+                f.write(os.urandom(4096))
+            with open(os.path.join(path, "build", f"out_{i}.py"), "w") as f:
+                f.write("x = 1\n")
+    repo.git.add("-A")
+    identity = {"GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@example.com",
+                "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@example.com"}
+    with repo.git.custom_environment(**identity):
+        repo.git.commit("-m", "synthetic", "--no-gpg-sign")
+    return path
+
+
+def _make_embedder(name):
+    if name == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        return DeterministicFakeEmbedding(size=384)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+
+
+def _import_embeddings(embedder):
+    # services.embeddings builds its embedder on import; it gets the benchmark's
+    # instead, so --embedder fake never loads MiniLM or needs sentence_transformers.
+    import embedding_cache
+
+    embedding_cache.cached_huggingface_embeddings = lambda model_name: embedder
+    from services import embeddings
+
+    return embeddings
+
+
+def _store(qdrant, collection_name, chunks, vectors, batch_size):
+    # Upserts precomputed vectors, so the store stage is not charged for embedding a second time.
+    points = [
+        models.PointStruct(
+            id=str(uuid.uuid4()), vector=vector,
+            payload={"page_content": chunk.page_content, "metadata": chunk.metadata},
+        )
+        for chunk, vector in zip(chunks, vectors)
+    ]
+    for i in range(0, len(points), batch_size):
+        qdrant.upsert(collection_name=collection_name, points=points[i:i + batch_size])
+
+
+class _DiscardingStore:
+    # Stands in for QdrantVectorStore: embeds what it is given and keeps nothing.
+    def __init__(self, embedder):
+        self.embedder = embedder
+
+    def add_documents(self, documents, ids=None):
+        self.embedder.embed_documents([doc.page_content for doc in documents])
+        return ids
+
+
+class _Progress:
+    files_loaded = 0
+    chunks_embedded = 0
+
+
+def _materialize(iterable):
+    items = list(iterable)
+    return items, len(items)
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import psutil  # outside Linux
+
+        return psutil.Process().memory_info().rss
+
+
+class _RssSampler(threading.Thread):
+    # Polls the current RSS while a stage runs and keeps the highest reading.
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = _rss_bytes()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.peak = max(self.peak, _rss_bytes())
+        return self.peak
+
+
+def _stage(name, fn, unit):
+    gc.collect()
+    sampler = _RssSampler()
+    rss_start = sampler.peak
+    sampler.start()
+    start = time.perf_counter()
+    result, count = fn()
+    wall = time.perf_counter() - start
+    peak = sampler.stop()
+    stats = {
+        "stage": name,
+        "wall_s": round(wall, 4),
+        unit: count,
+        f"{unit}_per_s": round(count / wall, 1) if wall else None,
+        "rss_start_mb": round(rss_start / 2**20, 1),
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "rss_growth_mb": round((peak - rss_start) / 2**20, 1),
+    }
+    print(
+        f"  {name:<10} {count:>7} {unit:<10} {wall:8.3f}s  {stats[f'{unit}_per_s']:>10} {unit}/s  "
+        f"RSS {stats['peak_rss_mb']} MB peak (+{stats['rss_growth_mb']} MB)"
+    )
+    return result, stats
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="bench-repo-")
+    try:
+        start = time.perf_counter()
+        make_synthetic_repo(workdir, args.files, args.functions, seed=args.seed)
+        print(f"synthetic repo: {args.files} files in {time.perf_counter() - start:.2f}s at {workdir}")
+        embedder = _make_embedder(args.embedder)
+        embedder.embed_documents(["warm-up"])
+        embeddings = _import_embeddings(embedder)
+
+        stages = []
+        docs, stats = _stage("load", lambda: _materialize(iter_repo_documents(workdir, workers=args.workers)), "files")
+        stages.append(stats)
+        pairs, stats = _stage("split", lambda: _materialize(split_code_documents(docs)), "chunks")
+        stages.append(stats)
+        chunks = [chunk for chunk, _ in pairs]
+        texts = [chunk.page_content for chunk in chunks]
+
+        def embed():
+            vectors = []
+            for i in range(0, len(texts), args.batch_size):
+                vectors.extend(embedder.embed_documents(texts[i:i + args.batch_size]))
+            return vectors, len(vectors)
+
+        vectors, stats = _stage("embed", embed, "embeddings")
+        stages.append(stats)
+        # The app's embeddings module talks to this client for the rest of the run.
+        embeddings.qdrant = QdrantClient(location=":memory:")
+        embeddings.EMBED_BATCH_SIZE = args.batch_size
+        collection_name = "bench_store"
+        embeddings.ensure_collection(collection_name)
+        _, stats = _stage("store", lambda: (_store(embeddings.qdrant, collection_name, chunks, vectors, args.batch_size), len(vectors)), "chunks")
+        stages.append(stats)
+        del docs, pairs, chunks, texts, vectors
+
+        if args.store == "discard":
+            embeddings.get_vector_store = lambda collection_name: _DiscardingStore(embedder)
+
+        def end_to_end():
+            # The indexer's own path: stream files, split, embed and upload in batches.
+            index_id = "bench"
+            progress = _Progress()
+            symbols, lexical = SymbolIndex(index_id), BM25Index(index_id)
+            embeddings.embed_documents(
+                iter_repo_documents(workdir, workers=args.workers), "bench_end_to_end", index_id,
+                symbols, lexical, progress=progress,
+            )
+            return (symbols, lexical), progress.chunks_embedded
+
+        _, stats = _stage("end_to_end", end_to_end, "chunks")
+        stages.append(stats)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "benchmark": "indexing",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "files": args.files,
+            "functions_per_file": args.functions,
+            "embedder": args.embedder,
+            "batch_size": args.batch_size,
+            "workers": args.workers,
+            "store": args.store,
+            "seed": args.seed,
+        },
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200, help="number of files in the synthetic repo")
+    parser.add_argument("--functions", type=int, default=12, help="functions/classes per Python file")
+    parser.add_argument("--embedder", choices=["minilm", "fake"], default="minilm",
+                        help="'fake' isolates the pipeline from model cost")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--store", choices=["memory", "discard"], default="memory",
+                        help="end-to-end run uploads to an in-memory Qdrant or drops the vectors")
+    parser.add_argument("--workers", type=int, default=LOADER_WORKERS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from services.code_splitter import split_python_source
+
+
+def _big_function(name, statements):
+    body = "\n\n".join(f"    value_{i} = compute_something_long({i}, 'argument number {i}')" for i in range(statements))
+    return f"def {name}():\n{body}\n    return value_0\n"
+
+
+def test_pieces_of_oversized_function_report_exact_lines():
+    source = "import os\n\n\n\n" + _big_function("huge", 60)
+    lines = source.splitlines()
+    function_line = lines.index("def huge():") + 1
+
+    pieces = split_python_source(source, chunk_size=400)
+
+    function_pieces = [piece for piece in pieces if piece[3] == "function"]
+    assert len(function_pieces) > 1
+    assert function_pieces[0][1] == function_line
+    for content, start, end, _, _ in function_pieces:
+        assert "\n".join(lines[start - 1:end]).strip() == content
+
+
+def test_small_functions_keep_their_segment_lines():
+    source = "def a():\n    return 1\n\n\ndef b():\n    return 2\n"
+    [(content, start, end, _, symbols)] = split_python_source(source)
+    assert (start, end) == (1, 6)
+    assert {name for name, _, _ in symbols} == {"a", "b"}
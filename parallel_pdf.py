@@ -0,0 +1,121 @@
+"""Page-parallel PDF text extraction, shared by the PDF ingestion paths in this repo.
+
+The pages are cut into fixed-size ranges that a process pool extracts with
+pypdf. Pages come back as LangChain Documents, in order, as soon as their
+range is done, so splitting and embedding can start before the last page
+is read. Short PDFs use PyPDFLoader serially.
+
+The pool is created once per process and shared by every call, so
+concurrent uploads queue for the same PDF_WORKERS processes. Its workers are
+started with forkserver (spawn where that is missing), not forked from the
+caller, which may be a multithreaded server whose held locks a forked child
+would inherit. They re-import the caller's __main__, so scripts using this
+must keep their work under an `if __name__ == "__main__":` guard.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from langchain_core.documents import Document
+from langchain_community.document_loaders import PyPDFLoader
+from pypdf import PdfReader
+
+PAGES_PER_TASK = 8
+# Below this a pool costs more to start than it saves.
+MIN_PARALLEL_PAGES = 16
+DEFAULT_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _extract_range(file_path, start, stop):
+    reader = PdfReader(file_path)
+    return [(page_number, reader.pages[page_number].extract_text().strip()) for page_number in range(start, stop)]
+
+
+def _document_metadata(reader, file_path, total_pages):
+    # The per-document fields PyPDFLoader puts on every page (producer,
+    # creator, creationdate, ...), normalized the same way.
+    info = {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+    info.update(reader.metadata or {})
+    metadata = {}
+    for key, value in info.items():
+        if type(value) not in (str, int):
+            value = str(value)
+        key = key.lstrip("/").lower()
+        if key in ("creationdate", "moddate"):
+            try:
+                value = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                pass
+        elif isinstance(value, str):
+            value = value.strip()
+        metadata[key] = value
+    metadata["source"] = file_path
+    metadata["total_pages"] = total_pages
+    return metadata
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _get_pool(workers):
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+        return pool
+
+
+def _discard_pool(workers, pool):
+    # A broken pool refuses new work; the next call starts a fresh one.
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def lazy_load_pdf(file_path, workers=DEFAULT_WORKERS, pages_per_task=PAGES_PER_TASK):
+    """Yields one Document per page, in page order, with the same metadata as PyPDFLoader."""
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    if workers <= 1 or total_pages < MIN_PARALLEL_PAGES:
+        yield from PyPDFLoader(file_path=file_path).lazy_load()
+        return
+
+    # page_labels works out every label on each access, so it is read once here.
+    page_labels = reader.page_labels
+    doc_metadata = _document_metadata(reader, file_path, total_pages)
+    ranges = [(start, min(start + pages_per_task, total_pages)) for start in range(0, total_pages, pages_per_task)]
+    pool = _get_pool(workers)
+    try:
+        futures = [pool.submit(_extract_range, file_path, start, stop) for start, stop in ranges]
+    except BrokenProcessPool:
+        _discard_pool(workers, pool)
+        futures = [None] * len(ranges)
+    try:
+        for (start, stop), future in zip(ranges, futures):
+            try:
+                if future is None:
+                    raise BrokenProcessPool
+                pages = future.result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); finish this range in-process.
+                _discard_pool(workers, pool)
+                pages = _extract_range(file_path, start, stop)
+            for page_number, text in pages:
+                yield Document(
+                    page_content=text,
+                    metadata=dict(doc_metadata, page=page_number, page_label=page_labels[page_number]),
+                )
+    finally:
+        # The pool outlives this call; ranges nobody will read are not left queued on it.
+        for future in futures:
+            if future is not None:
+                future.cancel()